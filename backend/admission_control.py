@@ -0,0 +1,242 @@
+import asyncio
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+
+# Lower value = served first. Voice turns have a caller waiting on the line.
+CHANNEL_PRIORITY = {"voice": 0, "whatsapp": 1, "web": 2}
+
+# How long a turn may wait in the queue before it is shed, per channel (seconds)
+QUEUE_BUDGET = {
+    "voice": float(os.environ.get("ADMISSION_BUDGET_VOICE", 3)),
+    "whatsapp": float(os.environ.get("ADMISSION_BUDGET_WHATSAPP", 10)),
+    "web": float(os.environ.get("ADMISSION_BUDGET_WEB", 20)),
+}
+
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", 32))
+DEFAULT_BUSINESS_CONCURRENCY = int(os.environ.get("ADMISSION_BUSINESS_CONCURRENCY", 8))
+DEFAULT_REQUESTS_PER_MINUTE = float(os.environ.get("ADMISSION_REQUESTS_PER_MINUTE", 60))
+DEFAULT_BURST = int(os.environ.get("ADMISSION_BURST", 10))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a turn is shed instead of queued. Carries a retry hint."""
+
+    def __init__(self, reason, retry_after=1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate_per_sec, burst):
+        self.rate = rate_per_sec
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Waiter:
+    __slots__ = ("priority", "deadline", "seq", "business_id", "granted")
+
+    def __init__(self, priority, deadline, seq, business_id, granted):
+        self.priority = priority
+        self.deadline = deadline
+        self.seq = seq
+        self.business_id = business_id
+        # asyncio.Future resolved when the waiter is handed a slot
+        self.granted = granted
+
+    def sort_key(self):
+        # Priority class first, then earliest deadline, then arrival order
+        return (self.priority, self.deadline, self.seq)
+
+
+class AdmissionController:
+    """
+    Gatekeeper in front of agent turns. Enforces a global concurrency cap,
+    per-business concurrency caps and per-business token buckets (to share
+    the OpenAI rate limit fairly), and hands free slots to waiting turns by
+    channel priority then deadline. Turns whose queue budget would be
+    exceeded are rejected up front with AdmissionRejected.
+
+    Admission runs on the event loop: a queued turn awaits a future instead
+    of holding one of the threadpool's threads, and only an admitted turn
+    is handed to the threadpool. All state is touched from the loop only.
+
+    `limits_for(business_id)` may return a dict with "max_concurrency" and
+    "requests_per_minute" overrides for that business.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, limits_for=None):
+        self.max_concurrency = max_concurrency
+        self.limits_for = limits_for or (lambda business_id: {})
+        self._seq = itertools.count()
+        self._waiters = []
+        self._running = 0
+        self._running_by_business = {}
+        self._buckets = {}
+        # Pending loop.call_later handle that re-checks waiters once a token refills
+        self._refill_timer = None
+        # Moving average of how long one admitted turn holds its slot
+        self._avg_service_time = 2.0
+        self.stats_counters = {"admitted": 0, "shed_estimate": 0, "shed_timeout": 0, "shed_rate_limit": 0}
+
+    def _limits(self, business_id):
+        limits = self.limits_for(business_id) or {}
+        return (
+            int(limits.get("max_concurrency", DEFAULT_BUSINESS_CONCURRENCY)),
+            float(limits.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)),
+            int(limits.get("burst", DEFAULT_BURST)),
+        )
+
+    def _bucket(self, business_id):
+        bucket = self._buckets.get(business_id)
+        if bucket is None:
+            _, rpm, burst = self._limits(business_id)
+            bucket = TokenBucket(rpm / 60.0, burst)
+            self._buckets[business_id] = bucket
+        return bucket
+
+    def _business_has_room(self, business_id):
+        cap, _, _ = self._limits(business_id)
+        return self._running_by_business.get(business_id, 0) < cap
+
+    def _slot_wait(self, ahead, running, capacity):
+        # Rounds of service needed before a slot frees up for us
+        if running + ahead < capacity:
+            return 0.0
+        return ((running + ahead - capacity) // capacity + 1) * self._avg_service_time
+
+    def _estimated_wait(self, business_id, priority, now):
+        """
+        Expected queueing delay for a new turn, as (global/business slot wait,
+        token wait). Each is the worst of the constraints the turn must clear.
+        """
+        ahead = sum(1 for w in self._waiters if w.priority <= priority)
+        global_wait = self._slot_wait(ahead, self._running, self.max_concurrency)
+
+        cap, _, _ = self._limits(business_id)
+        ahead_here = sum(1 for w in self._waiters if w.business_id == business_id and w.priority <= priority)
+        business_wait = self._slot_wait(ahead_here, self._running_by_business.get(business_id, 0), max(1, cap))
+
+        # Every turn queued ahead for this business spends a token before ours
+        bucket = self._bucket(business_id)
+        bucket.time_until_token(now)
+        debt = ahead_here + 1 - bucket.tokens
+        if debt <= 0:
+            token_wait = 0.0
+        else:
+            token_wait = debt / bucket.rate if bucket.rate > 0 else float("inf")
+        return max(global_wait, business_wait), token_wait
+
+    def _next_eligible(self, now):
+        """The waiter that should get the next slot, and how long until it could if none can yet."""
+        if self._running >= self.max_concurrency:
+            return None, None
+        soonest = None
+        for w in sorted(self._waiters, key=_Waiter.sort_key):
+            if not self._business_has_room(w.business_id):
+                continue
+            delay = self._bucket(w.business_id).time_until_token(now)
+            if delay == 0:
+                return w, None
+            soonest = delay if soonest is None else min(soonest, delay)
+        return None, soonest
+
+    def _dispatch(self):
+        """Hands free slots to eligible waiters, then schedules a re-check for the next token refill."""
+        if self._refill_timer is not None:
+            self._refill_timer.cancel()
+            self._refill_timer = None
+        now = time.monotonic()
+        while True:
+            chosen, retry_in = self._next_eligible(now)
+            if chosen is None:
+                break
+            self._waiters.remove(chosen)
+            self._take_slot(chosen.business_id)
+            chosen.granted.set_result(None)
+        if retry_in is not None and self._waiters:
+            self._refill_timer = asyncio.get_running_loop().call_later(retry_in, self._dispatch)
+
+    def _take_slot(self, business_id):
+        self._bucket(business_id).take()
+        self._running += 1
+        self._running_by_business[business_id] = self._running_by_business.get(business_id, 0) + 1
+        self.stats_counters["admitted"] += 1
+
+    def _release_slot(self, business_id, elapsed=None):
+        self._running -= 1
+        self._running_by_business[business_id] -= 1
+        if elapsed is not None:
+            self._avg_service_time = 0.9 * self._avg_service_time + 0.1 * elapsed
+        # A freed slot may let the next waiter in
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, business_id, channel="web"):
+        priority = CHANNEL_PRIORITY.get(channel, CHANNEL_PRIORITY["web"])
+        budget = QUEUE_BUDGET.get(channel, QUEUE_BUDGET["web"])
+
+        now = time.monotonic()
+        slot_wait, token_wait = self._estimated_wait(business_id, priority, now)
+        if slot_wait > budget:
+            self.stats_counters["shed_estimate"] += 1
+            raise AdmissionRejected(f"Queue wait ~{slot_wait:.1f}s exceeds {channel} budget", retry_after=slot_wait)
+        if token_wait > budget:
+            self.stats_counters["shed_rate_limit"] += 1
+            raise AdmissionRejected(f"Rate limit reached for {business_id}", retry_after=token_wait)
+
+        waiter = _Waiter(priority, now + budget, next(self._seq), business_id,
+                         asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            # shield: a timeout must not cancel a grant made in the same loop tick
+            await asyncio.wait_for(asyncio.shield(waiter.granted), timeout=budget)
+        except BaseException as e:
+            if waiter.granted.done():
+                if isinstance(e, asyncio.TimeoutError):
+                    pass  # Granted just as the budget ran out: take the slot
+                else:
+                    # Cancelled (client went away) after being granted: give it back
+                    self._release_slot(business_id)
+                    raise
+            else:
+                self._waiters.remove(waiter)
+                # Our departure may unblock someone who was behind us
+                self._dispatch()
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats_counters["shed_timeout"] += 1
+                    raise AdmissionRejected(f"Timed out waiting for a slot ({channel})", retry_after=self._avg_service_time)
+                raise
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release_slot(business_id, time.monotonic() - started)
+
+    def stats(self):
+        return {
+            "running": self._running,
+            "queued": len(self._waiters),
+            "running_by_business": dict(self._running_by_business),
+            "avg_service_time": round(self._avg_service_time, 3),
+            **self.stats_counters,
+        }
@@ -1,15 +1,17 @@
-from openai import OpenAI
 import os
 import json
 from sheets_manager import SheetsManager
 from business_manager import BusinessManager
+from inventory_snapshot import load_snapshot
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+import time
 
 load_dotenv()
 
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 business_manager = BusinessManager()
+_openai_client = None
 
 # Cache for SheetsManager instances to avoid reconnecting every time
 # Key: business_id, Value: SheetsManager instance
@@ -19,6 +21,14 @@ sheet_instances = {}
 # Key: session_id, Value: { history: [], cart: [], business_id: str }
 sessions = {}
 
+def get_openai_client():
+    # Created on first use so importing the app doesn't pay for the openai import
+    global _openai_client
+    if _openai_client is None:
+        from openai import OpenAI
+        _openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _openai_client
+
 def get_sheets_manager(business_id):
     if business_id in sheet_instances:
         return sheet_instances[business_id]
@@ -36,10 +46,42 @@ def get_sheets_manager(business_id):
         return None
         return None
         
-    instance = SheetsManager(inventory_sheet_id=biz_config["sheet_id"])
+    instance = SheetsManager(inventory_sheet_id=biz_config["sheet_id"], schema=business_manager.column_map(biz_config), preload=False)
+    snapshot, _ = load_snapshot(business_id, business_manager.snapshot_sheet_id(biz_config))
+    if snapshot is not None:
+        # Serve from the local snapshot right away; refresh_all_businesses brings it up to date
+        instance.inventory = snapshot
+    elif instance.client and business_manager.reads_from_sheet(biz_config):
+        instance.refresh_inventory()
     sheet_instances[business_id] = instance
     return instance
 
+def _inventory_changed(business_id):
+    # Drop the cached instance; the next request loads the snapshot the job just saved
+    sheet_instances.pop(business_id, None)
+
+business_manager.on_inventory_changed = _inventory_changed
+
+def refresh_all_businesses():
+    """
+    Refreshes every business from Sheets and re-indexes those whose inventory
+    changed. Run in the background at startup, so requests are served from
+    the snapshots meanwhile.
+    """
+    started = time.monotonic()
+    for biz in business_manager.list_businesses():
+        if not business_manager.reads_from_sheet(biz):
+            # Catalog came from an uploaded CSV; its snapshot is the source of truth
+            continue
+        sheets = get_sheets_manager(biz["id"])
+        if not sheets:
+            continue
+        # Without a snapshot, get_sheets_manager has just read the sheet itself
+        if sheets.refreshed_at is None or sheets.refreshed_at < started:
+            sheets.refresh_inventory()
+        business_manager.index_business(biz, sheets)
+    print("Background inventory refresh complete.")
+
 from jinja2 import Environment, FileSystemLoader
 
 # ... (retain existing imports)
@@ -50,23 +92,74 @@ jinja_env = Environment(loader=FileSystemLoader(prompts_dir))
 
 # ... (retain existing code up to get_system_prompt)
 
+def _template_name(business_type):
+    # Default Retail/Electronics
+    return 'restaurant.j2' if business_type == "restaurant" else 'retail.j2'
+
 def get_system_prompt(business_type, current_time=None):
     try:
-        if business_type == "restaurant":
-            template = jinja_env.get_template('restaurant.j2')
-            return template.render(current_time=current_time)
-        else:
-            # Default Retail/Electronics
-            template = jinja_env.get_template('retail.j2')
-            return template.render()
+        template = jinja_env.get_template(_template_name(business_type))
+        return template.render(current_time=current_time)
     except Exception as e:
         print(f"Error loading prompt template: {e}")
         # Fallback to a basic prompt if template loading fails
         return "You are a helpful assistant."
 
+def _prompt_fingerprint(business_type, system_prompt):
+    # The template source, not the rendered prompt: the restaurant prompt
+    # embeds the current time, which would start a new cache every minute
+    try:
+        source, _, _ = jinja_env.loader.get_source(jinja_env, _template_name(business_type))
+    except Exception:
+        return prompt_fingerprint(system_prompt, business_type)
+    return prompt_fingerprint(source, business_type, time_dependent="current_time" in source)
+
 from tools_def import TOOLS
+from admission_control import AdmissionController, AdmissionRejected
+from answer_cache import answer_cache, prompt_fingerprint, CART_INDEPENDENT_TOOLS
+
+def _business_limits(business_id):
+    # Optional per-business overrides in business_config.json, e.g.
+    # "config": {"max_concurrency": 4, "requests_per_minute": 30}
+    biz_config = business_manager.get_business(business_id) or {}
+    return biz_config.get("config") or {}
+
+admission_controller = AdmissionController(limits_for=_business_limits)
 
-def get_agent_response(session_id, user_text, image_url=None, business_id="electronics_default"):
+async def get_agent_response(session_id, user_text, image_url=None, business_id="electronics_default", channel="web"):
+    """
+    Runs one agent turn once the admission controller grants it a slot.
+    Called from async endpoints: waiting for a slot happens on the event
+    loop, and only the admitted turn (blocking OpenAI/Sheets calls) runs in
+    the threadpool.
+    Raises AdmissionRejected when the turn is shed; callers turn that into a
+    429 / "please hold" reply for their channel.
+    Opening questions may be answered from the per-business answer cache.
+    """
+    session = _get_session(session_id, business_id)
+
+    probe = None
+    biz_config = business_manager.get_business(business_id) or {}
+    if answer_cache.is_cacheable_turn(session, image_url) and answer_cache.enabled_for(biz_config):
+        fingerprint = _prompt_fingerprint(biz_config.get("type", "retail"), session["history"][0]["content"])
+        # May embed the question, so keep it off the event loop
+        probe = await run_in_threadpool(answer_cache.lookup, business_id, fingerprint, user_text)
+        if probe.answer is not None:
+            print(f"Answer cache hit for {business_id}: '{user_text}'")
+            session["history"].append({"role": "user", "content": user_text})
+            session["history"].append({"role": "assistant", "content": probe.answer})
+            return probe.answer
+
+    async with admission_controller.admit(business_id, channel):
+        started = time.monotonic()
+        answer, tools_used = await run_in_threadpool(_run_agent_turn, session, user_text, image_url)
+        latency = time.monotonic() - started
+
+    if probe is not None and tools_used <= CART_INDEPENDENT_TOOLS:
+        await run_in_threadpool(answer_cache.store, probe, answer, latency)
+    return answer
+
+def _get_session(session_id, business_id):
     # Initialize or Reset Session
     if session_id not in sessions or sessions[session_id].get("business_id") != business_id:
         biz_config = business_manager.get_business(business_id)
@@ -83,10 +176,14 @@ def get_agent_response(session_id, user_text, image_url=None, business_id="elect
             "business_id": business_id
         }
     
-    session = sessions[session_id]
-    
+    return sessions[session_id]
+
+def _run_agent_turn(session, user_text, image_url=None):
+    """Returns the final reply and the set of tool names the model called."""
+    tools_used = set()
+
     # Ensure we use the correct Sheets instance for this session's business
-    current_biz_id = session.get("business_id", business_id)
+    current_biz_id = session["business_id"]
     sheets = get_sheets_manager(current_biz_id)
     
     if image_url:
@@ -98,7 +195,7 @@ def get_agent_response(session_id, user_text, image_url=None, business_id="elect
     else:
         session["history"].append({"role": "user", "content": user_text})
 
-    response = client.chat.completions.create(
+    response = get_openai_client().chat.completions.create(
         model="gpt-4o",
         messages=session["history"],
         tools=TOOLS,
@@ -112,26 +209,33 @@ def get_agent_response(session_id, user_text, image_url=None, business_id="elect
         
         for tool_call in msg.tool_calls:
             fn_name = tool_call.function.name
+            tools_used.add(fn_name)
             args = json.loads(tool_call.function.arguments)
             result_content = ""
             
             if fn_name == "search_inventory":
                 results = []
                 query = args["query"]
+                filters = {k: args[k] for k in ("min_price", "max_price", "category", "in_stock_only") if args.get(k) is not None}
                 
-                # 1. Try Vector Search
+                # 1. A quoted SKU is answered from the in-memory index, no vector lookup
+                record = sheets.inventory.get(query.strip()) if sheets else None
+                if record and record.matches(**filters):
+                    results = [record.to_dict()]
+
+                # 2. Try Vector Search
                 try:
-                    if business_manager.vector_store:
+                    if not results and business_manager.vector_store:
                         print(f"Attempting Vector Search for: {query}")
-                        results = business_manager.vector_store.search(query, current_biz_id)
+                        results = business_manager.vector_store.search(query, current_biz_id, **filters)
                 except Exception as e:
                     print(f"Vector search failed with error: {e}")
                 
-                # 2. Fallback to Keyword Search if Vector returned nothing or failed
+                # 3. Fallback to Keyword Search if Vector returned nothing or failed
                 if not results:
                     print(f"Vector search yielded no results. Fallback to Keyword Search for: {query}")
                     if sheets:
-                        results = sheets.search_inventory(query)
+                        results = sheets.search_inventory(query, **filters)
                     else:
                         print("Sheets manager unavailable for fallback.")
 
@@ -164,13 +268,13 @@ def get_agent_response(session_id, user_text, image_url=None, business_id="elect
                 "content": result_content
             })
         
-        final_response = client.chat.completions.create(
+        final_response = get_openai_client().chat.completions.create(
             model="gpt-4o",
             messages=session["history"]
         )
         final_msg = final_response.choices[0].message.content
         session["history"].append({"role": "assistant", "content": final_msg})
-        return final_msg
+        return final_msg, tools_used
     else:
         session["history"].append(msg)
-        return msg.content
+        return msg.content, tools_used
@@ -0,0 +1,197 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Opt-in per business via "config": {"answer_cache": true}, or for every
+# business with ANSWER_CACHE_ENABLED=1.
+ENABLED_BY_DEFAULT = os.environ.get("ANSWER_CACHE_ENABLED", "0") == "1"
+TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL", 600))
+MAX_ENTRIES_PER_BUSINESS = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 256))
+# Window within which answers from time-aware prompts (e.g. restaurant hours) are shared
+TIME_BUCKET_SECONDS = float(os.environ.get("ANSWER_CACHE_TIME_BUCKET", 900))
+# Cosine similarity needed to reuse an answer for a differently worded
+# question, e.g. 0.95. Off (0) by default: "fans under 500" and "fans under
+# 5000" embed almost identically, so only identical normalized questions match.
+SIMILARITY_THRESHOLD = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0))
+
+# Tools whose result doesn't depend on (or change) the customer's cart
+CART_INDEPENDENT_TOOLS = {"search_inventory"}
+
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_question(text):
+    """'What PIZZAS do you have?' -> 'what pizzas do you have'"""
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def _numbers(key):
+    # Prices, quantities and sizes a similar-looking question must share
+    return sorted(_NUMBER_RE.findall(key))
+
+
+def prompt_fingerprint(template_source, business_type, time_dependent=False):
+    """
+    Cache namespace for a business's prompt: a template edit or a change of
+    business type starts a fresh cache. Templates that render the current
+    time also change namespace every TIME_BUCKET_SECONDS, so an answer that
+    depends on the time of day isn't served outside its window.
+    """
+    parts = [business_type, template_source]
+    if time_dependent:
+        parts.append(str(int(time.time() // TIME_BUCKET_SECONDS)))
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _unit(vector):
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class _Entry:
+    __slots__ = ("answer", "embedding", "latency", "created")
+
+    def __init__(self, answer, embedding, latency):
+        self.answer = answer
+        self.embedding = embedding
+        self.latency = latency
+        self.created = time.monotonic()
+
+
+class CacheProbe:
+    """Result of a lookup; pass it back to `store` on a miss."""
+    __slots__ = ("business_id", "fingerprint", "key", "generation", "embedding", "answer")
+
+    def __init__(self, business_id, fingerprint, key, generation, embedding=None, answer=None):
+        self.business_id = business_id
+        self.generation = generation
+        self.fingerprint = fingerprint
+        self.key = key
+        self.embedding = embedding
+        self.answer = answer
+
+
+class AnswerCache:
+    """
+    Caches final answers to first-turn, cart-independent questions per
+    business. Entries are keyed by the business, the system prompt
+    fingerprint and the normalized question; near-duplicate questions can
+    also hit via embedding similarity. `invalidate` drops a business's
+    entries when its inventory is re-indexed.
+    """
+
+    def __init__(self, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES_PER_BUSINESS,
+                 similarity_threshold=SIMILARITY_THRESHOLD, embed=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        # Callable text -> embedding; defaults to the shared embedding service
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._entries = {}  # business_id -> OrderedDict[(fingerprint, key)] -> _Entry
+        # Bumped on invalidate, so answers computed before a re-index aren't stored after it
+        self._generations = {}
+        self.counters = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "saved_latency_seconds": 0.0}
+
+    def enabled_for(self, biz_config):
+        return bool((biz_config.get("config") or {}).get("answer_cache", ENABLED_BY_DEFAULT))
+
+    @staticmethod
+    def is_cacheable_turn(session, image_url=None):
+        # Only the opening question of a session, with nothing in the cart
+        return not image_url and len(session["history"]) == 1 and not session["cart"]
+
+    def _embedding_for(self, text):
+        if self.similarity_threshold <= 0:
+            return None
+        try:
+            if self._embed is None:
+                from embedding_service import get_embedding_service
+                self._embed = get_embedding_service().embed_query
+            return _unit(self._embed(text))
+        except Exception as e:
+            # Similarity matching is best effort; exact matches still work
+            print(f"Answer cache embedding unavailable: {e}")
+            return None
+
+    def lookup(self, business_id, fingerprint, question):
+        key = normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            probe = CacheProbe(business_id, fingerprint, key, self._generations.get(business_id, 0))
+            entries = self._entries.get(business_id)
+            entry = entries.get((fingerprint, key)) if entries else None
+            if entry and now - entry.created <= self.ttl:
+                entries.move_to_end((fingerprint, key))
+                self.counters["hits"] += 1
+                self.counters["saved_latency_seconds"] += entry.latency
+                probe.answer = entry.answer
+                return probe
+            if not entries:
+                self.counters["misses"] += 1
+                return probe
+
+        probe.embedding = self._embedding_for(key)
+        if probe.embedding is None:
+            with self._lock:
+                self.counters["misses"] += 1
+            return probe
+
+        numbers = _numbers(key)
+        with self._lock:
+            best, best_score = None, self.similarity_threshold
+            for (fp, entry_key), entry in (self._entries.get(business_id) or {}).items():
+                if fp != fingerprint or entry.embedding is None or now - entry.created > self.ttl:
+                    continue
+                if _numbers(entry_key) != numbers:
+                    continue
+                score = sum(a * b for a, b in zip(probe.embedding, entry.embedding))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best:
+                self.counters["similar_hits"] += 1
+                self.counters["saved_latency_seconds"] += best.latency
+                probe.answer = best.answer
+            else:
+                self.counters["misses"] += 1
+        return probe
+
+    def store(self, probe, answer, latency):
+        if not answer:
+            return
+        if probe.embedding is None:
+            # Lookups skip embedding while a business has no entries yet
+            probe.embedding = self._embedding_for(probe.key)
+        with self._lock:
+            if self._generations.get(probe.business_id, 0) != probe.generation:
+                return
+            entries = self._entries.setdefault(probe.business_id, OrderedDict())
+            entries[(probe.fingerprint, probe.key)] = _Entry(answer, probe.embedding, latency)
+            entries.move_to_end((probe.fingerprint, probe.key))
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self.counters["stores"] += 1
+
+    def invalidate(self, business_id):
+        with self._lock:
+            self._generations[business_id] = self._generations.get(business_id, 0) + 1
+            if self._entries.pop(business_id, None):
+                self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            hits = self.counters["hits"] + self.counters["similar_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.counters.items()},
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "entries_by_business": {b: len(e) for b, e in self._entries.items()},
+            }
+
+
+answer_cache = AnswerCache()
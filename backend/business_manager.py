@@ -1,34 +1,107 @@
 import json
 import os
-from typing import List, Optional, Dict
+from datetime import datetime
+from typing import List, Optional, Dict, Tuple
 from sheets_manager import SheetsManager
-from vector_store import VectorStoreManager
+from inventory_snapshot import load_snapshot, save_snapshot, content_hash
 
 CONFIG_FILE = "business_config.json"
 
 class BusinessManager:
     def __init__(self):
         self.businesses = self._load_businesses()
-        self.vector_store = VectorStoreManager()
-        
-        # Ensure all loaded businesses are indexed (Self-Healing)
-        # In production, check if exists first to avoid re-indexing every restart
-        for biz in self.businesses:
-            self.index_business(biz)
+        # Opening Chroma and starting the embedding pool is slow, so both are
+        # created on first use rather than at import time.
+        self._vector_store = None
+        self._ingestion = None
+        # Optional callback(business_id), called after an ingestion job replaces the catalog
+        self.on_inventory_changed = None
+
+    @property
+    def vector_store(self):
+        if self._vector_store is None:
+            from vector_store import VectorStoreManager
+            self._vector_store = VectorStoreManager()
+        return self._vector_store
+
+    @property
+    def ingestion(self):
+        if self._ingestion is None:
+            from ingestion_manager import IngestionManager
+            self._ingestion = IngestionManager(self.vector_store, on_complete=self._ingestion_completed)
+        return self._ingestion
+
+    @staticmethod
+    def column_map(biz_data):
+        # Per-business column mapping, e.g. "config": {"column_map": {"name": "Dish Name"}}
+        return (biz_data.get('config') or {}).get('column_map')
+
+    @staticmethod
+    def reads_from_sheet(biz_data):
+        """False once the catalog was last ingested from an uploaded CSV instead of the sheet."""
+        return (biz_data.get('ingest_source') or {}).get('type', 'sheets') == 'sheets'
 
-    def index_business(self, biz_data):
+    @classmethod
+    def snapshot_sheet_id(cls, biz_data):
+        # CSV snapshots aren't tied to a sheet
+        return biz_data['sheet_id'] if cls.reads_from_sheet(biz_data) else None
+
+    def _ingestion_completed(self, job):
+        biz = self.get_business(job["business_id"])
+        if biz is not None:
+            # Remember where the catalog now comes from, so the startup refresh
+            # doesn't overwrite an uploaded CSV with the sheet's contents
+            biz['ingest_source'] = {
+                'type': job['source'],
+                'job_id': job['id'],
+                'completed_at': datetime.now().isoformat(timespec="seconds"),
+            }
+            self.save_businesses()
+        if self.on_inventory_changed:
+            try:
+                self.on_inventory_changed(job["business_id"])
+            except Exception as e:
+                print(f"Error handling inventory change for {job['business_id']}: {e}")
+
+    def index_business(self, biz_data, sheets=None):
+        """
+        Indexes a business's current inventory, skipping the re-index when it
+        matches the local snapshot and the vector store already has it.
+        Pass an already refreshed SheetsManager to avoid fetching twice.
+        """
+        if not self.reads_from_sheet(biz_data):
+            print(f"Catalog for {biz_data['id']} was ingested from CSV. Skipping sheet re-index.")
+            return
         try:
              print(f"Checking ingestion for {biz_data.get('name', 'Unknown')}...")
-             # For this demo, we re-index on startup to ensure freshness. 
-             # Optimization: Check if vector_store has items for this business_id before indexing.
-             sheets = SheetsManager(inventory_sheet_id=biz_data['sheet_id'])
-             if not sheets.inventory_data:
+             if sheets is None:
+                 sheets = SheetsManager(inventory_sheet_id=biz_data['sheet_id'], schema=self.column_map(biz_data))
+             if sheets.refreshed_at is None:
                  sheets.refresh_inventory()
              
-             if sheets.inventory_data:
-                 self.vector_store.index_inventory(biz_data['id'], sheets.inventory_data)
-             else:
+             if not sheets.inventory:
                  print(f"Warning: No inventory to index for {biz_data['id']}")
+                 return
+
+             digest = content_hash(sheets.inventory.records)
+             _, snapshot = load_snapshot(biz_data['id'], biz_data['sheet_id'])
+             if snapshot and snapshot.get('content_hash') == digest and self.vector_store.has_business(biz_data['id']):
+                 print(f"Inventory for {biz_data['id']} unchanged since last snapshot. Skipping re-index.")
+                 return
+
+             # delete_stale would drop what a running ingestion job has already upserted
+             lock = self.ingestion.business_lock(biz_data['id'])
+             if not lock.acquire(blocking=False):
+                 print(f"Ingestion job running for {biz_data['id']}. Skipping re-index.")
+                 return
+             try:
+                 # Chunked upsert, then drop stale vectors: search keeps working meanwhile
+                 self.ingestion.index_records(biz_data['id'], sheets.inventory.records)
+                 # Still under the lock, so a job finishing right after can't
+                 # have its newer snapshot overwritten by this one
+                 save_snapshot(biz_data['id'], biz_data['sheet_id'], sheets.inventory, digest)
+             finally:
+                 lock.release()
         except Exception as e:
             print(f"Error indexing {biz_data.get('name')}: {e}")
 
@@ -58,7 +131,13 @@ class BusinessManager:
     def list_businesses(self) -> List[Dict]:
         return self.businesses
 
-    def create_business(self, business_data: Dict) -> Dict:
+    def create_business(self, business_data: Dict) -> Tuple[Dict, Optional[Dict]]:
+        """
+        Saves a new business and creates its initial ingestion job. The job is
+        not run here: callers hand it to run_job in the background and poll
+        /admin/ingest/{job_id}. Returns (business, job); job is None if it
+        couldn't be created.
+        """
         # Simple ID generation if not provided
         if "id" not in business_data:
             business_data["id"] = f"biz_{len(self.businesses) + 1}"
@@ -66,22 +145,13 @@ class BusinessManager:
         self.businesses.append(business_data)
         self.save_businesses()
         
-        # Trigger Initial Indexing
+        # Initial Indexing (streamed in chunks so large catalogs stay bounded in memory)
+        job = None
         try:
-            print(f"Triggering ingestion for {business_data.get('name', 'Unknown')} ({business_data['id']})...")
-            sheets = SheetsManager(inventory_sheet_id=business_data['sheet_id'])
-            # Ensure we have data
-            if not sheets.inventory_data:
-                sheets.refresh_inventory()
-            
-            if sheets.inventory_data:
-                 self.vector_store.index_inventory(business_data['id'], sheets.inventory_data)
-                 print("Ingestion successful.")
-            else:
-                print("Warning: No inventory data found to index.")
-
+            print(f"Creating ingestion job for {business_data.get('name', 'Unknown')} ({business_data['id']})...")
+            job = self.ingestion.create_sheets_job(business_data['id'], business_data['sheet_id'], schema=self.column_map(business_data))
         except Exception as e:
-            print(f"Error during ingestion: {e}")
+            print(f"Error creating ingestion job: {e}")
             # Don't fail the create_business call, just log error
 
-        return business_data
+        return business_data, job
@@ -0,0 +1,217 @@
+import atexit
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Priorities for the shared queue. Lower runs first, so interactive searches
+# jump ahead of bulk (re-)indexing chunks that are already waiting.
+PRIORITY_QUERY = 0
+PRIORITY_BULK = 1
+
+# Embedding function instance living inside each worker process
+_worker_ef = None
+
+
+def _init_worker():
+    global _worker_ef
+    # Chroma's default embedding function (ONNX all-MiniLM-L6-v2), the same
+    # model the "inventory" collection was created with, so dimensions match.
+    from chromadb.utils import embedding_functions
+    _worker_ef = embedding_functions.DefaultEmbeddingFunction()
+
+
+def _embed_batch(texts):
+    embeddings = _worker_ef(texts)
+    return [e.tolist() if hasattr(e, "tolist") else list(e) for e in embeddings]
+
+
+class EmbeddingQueueFull(RuntimeError):
+    """Raised when the embedding queue stays full past the submit timeout."""
+
+
+class EmbeddingService:
+    """
+    Computes embeddings in a pool of worker processes, off the request threads.
+    Requests arriving within `batch_window_ms` of each other are merged into a
+    single forward pass of up to `max_batch_size` texts.
+    """
+
+    def __init__(self, max_workers=None, max_batch_size=64, batch_window_ms=5,
+                 max_queue_size=256, submit_timeout=2.0):
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.submit_timeout = submit_timeout
+
+        # Bounded queue of (priority, seq, texts, future)
+        self._queue = queue.PriorityQueue(maxsize=max_queue_size)
+        self._seq = itertools.count()
+        # Cap batches in flight so excess work waits in the bounded queue
+        # (and applies backpressure) instead of piling up inside the pool.
+        self._in_flight = threading.BoundedSemaphore(self.max_workers)
+        self._stopped = threading.Event()
+        # Request pulled off the queue that didn't fit in the previous batch
+        self._carry = None
+
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embedding-dispatcher", daemon=True)
+        self._dispatcher.start()
+        print(f"Embedding service started with {self.max_workers} worker(s).")
+
+    def embed(self, texts, priority=PRIORITY_QUERY):
+        """
+        Returns one embedding (list of floats) per text. Blocks until done.
+        Interactive callers get EmbeddingQueueFull if the service stays
+        saturated; bulk callers just wait for room in the queue.
+        """
+        if not texts:
+            return []
+        timeout = None if priority == PRIORITY_BULK else self.submit_timeout
+        futures = [
+            self._submit(texts[i:i + self.max_batch_size], priority, timeout)
+            for i in range(0, len(texts), self.max_batch_size)
+        ]
+        embeddings = []
+        for fut in futures:
+            embeddings.extend(fut.result())
+        return embeddings
+
+    def embed_query(self, text):
+        return self.embed([text], priority=PRIORITY_QUERY)[0]
+
+    def _submit(self, texts, priority, timeout):
+        if self._stopped.is_set():
+            raise RuntimeError("Embedding service is shut down")
+        fut = Future()
+        try:
+            self._queue.put((priority, next(self._seq), list(texts), fut), timeout=timeout)
+        except queue.Full:
+            raise EmbeddingQueueFull(f"Embedding queue full ({self._queue.maxsize} pending requests)")
+        return fut
+
+    def _new_pool(self):
+        # "spawn" avoids forking a process that already runs server threads
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _replace_pool(self, broken):
+        """
+        Swaps in a fresh pool after a worker died (OOM kill, segfault). Several
+        in-flight batches report the same broken pool; only the first rebuilds.
+        """
+        with self._pool_lock:
+            if self._pool is not broken or self._stopped.is_set():
+                return
+            print("Embedding worker pool broke; starting a new one.")
+            self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _collect_batch(self):
+        """Blocks for the first request, then gathers more for up to batch_window."""
+        if self._carry is not None:
+            first, self._carry = self._carry, None
+        else:
+            first = self._queue.get()
+        if first[2] is None:
+            return None
+        batch = [first]
+        size = len(first[2])
+        deadline = time.monotonic() + self.batch_window
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item[2] is None or size + len(item[2]) > self.max_batch_size:
+                # Shutdown sentinel or doesn't fit: keep it for the next batch
+                self._carry = item
+                break
+            batch.append(item)
+            size += len(item[2])
+        return batch
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            self._in_flight.acquire()
+            texts = [t for _, _, item_texts, _ in batch for t in item_texts]
+            pool = self._pool
+            try:
+                try:
+                    pool_future = pool.submit(_embed_batch, texts)
+                except BrokenProcessPool:
+                    # The pool broke before this batch reached it; retry once on a new one
+                    self._replace_pool(pool)
+                    pool = self._pool
+                    pool_future = pool.submit(_embed_batch, texts)
+            except Exception as e:
+                self._in_flight.release()
+                for _, _, _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            pool_future.add_done_callback(lambda pf, b=batch, p=pool: self._resolve(pf, b, p))
+
+    def _resolve(self, pool_future, batch, pool):
+        self._in_flight.release()
+        try:
+            embeddings = pool_future.result()
+        except Exception as e:
+            print(f"Embedding batch failed: {e}")
+            if isinstance(e, BrokenProcessPool):
+                # Only batches that were inside the dead pool fail; later ones go to the new pool
+                self._replace_pool(pool)
+            for _, _, _, fut in batch:
+                fut.set_exception(e)
+            return
+        offset = 0
+        for _, _, texts, fut in batch:
+            fut.set_result(embeddings[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def shutdown(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        # Sentinel sorts after every real request and wakes the dispatcher
+        try:
+            self._queue.put((float("inf"), next(self._seq), None, None), timeout=1)
+        except queue.Full:
+            pass
+        self._dispatcher.join(timeout=5)
+        with self._pool_lock:
+            pool = self._pool
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """Process-wide shared EmbeddingService, started on first use."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = EmbeddingService(
+                    max_workers=int(os.environ.get("EMBEDDING_WORKERS", 0)) or None,
+                    max_batch_size=int(os.environ.get("EMBEDDING_MAX_BATCH", 64)),
+                    batch_window_ms=float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", 5)),
+                    max_queue_size=int(os.environ.get("EMBEDDING_MAX_QUEUE", 256)),
+                )
+                atexit.register(_service.shutdown)
+    return _service
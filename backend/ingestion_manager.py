@@ -0,0 +1,286 @@
+import csv
+import itertools
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from gspread.utils import numericise_all
+from sheets_manager import SheetsManager
+from inventory_model import SchemaMapping
+from answer_cache import answer_cache
+from inventory_snapshot import part_path, append_part, finalize_part, part_name_counts
+
+JOBS_FILE = "ingestion_jobs.json"
+UPLOAD_DIR = "ingest_uploads"
+DEFAULT_CHUNK_SIZE = 500
+# Jobs in these states hold the business's single ingestion slot
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class IngestionConflict(RuntimeError):
+    """Raised when a business already has an active job, or a job can't be (re)started."""
+
+
+def iter_csv_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, start_row=0, schema=None, seen_names=None):
+    """
+    Streams a CSV file as (records, next_row) chunks, same shape as
+    SheetsManager.iter_inventory_chunks. Only one chunk is held in memory.
+    Pass the `seen_names` of the rows before `start_row` when resuming.
+    """
+    mapping = SchemaMapping(schema)
+    seen_names = {} if seen_names is None else seen_names
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if not headers:
+            # Same as the Sheets reader: never report an empty catalog
+            raise ValueError(f"CSV file {os.path.basename(path)} has no header row")
+        row_no = start_row
+        chunk_start = start_row
+        chunk = []
+        for raw in itertools.islice(reader, start_row, None):
+            row_no += 1
+            if any(v.strip() for v in raw):
+                raw = numericise_all(raw + [""] * (len(headers) - len(raw)))
+                chunk.append(dict(zip(headers, raw)))
+            if row_no - chunk_start >= chunk_size:
+                yield mapping.to_records(chunk, seen_names), row_no
+                chunk = []
+                chunk_start = row_no
+        if row_no > chunk_start:
+            yield mapping.to_records(chunk, seen_names), row_no
+
+
+class IngestionManager:
+    """
+    Chunked catalog ingestion into the vector store. Rows are read, embedded
+    and upserted `chunk_size` at a time; progress is persisted after every
+    chunk so a failed job can be resumed from where it stopped.
+
+    Each business has at most one pending or running job. When a job
+    completes, the business's older jobs are marked superseded and can no
+    longer be resumed.
+    """
+
+    def __init__(self, vector_store, on_complete=None):
+        self.vector_store = vector_store
+        # Called with the job after it completes and its snapshot is saved
+        self.on_complete = on_complete
+        self._lock = threading.Lock()
+        # Held for the whole run of a job; BusinessManager.index_business
+        # skips a business whose lock is taken instead of wiping its vectors.
+        self._business_locks = {}
+        self.jobs = self._load_jobs()
+
+    def _load_jobs(self):
+        if not os.path.exists(JOBS_FILE):
+            return {}
+        try:
+            with open(JOBS_FILE, 'r') as f:
+                jobs = json.load(f)
+        except Exception as e:
+            print(f"Error loading ingestion jobs: {e}")
+            return {}
+        # A job still pending or running was interrupted by a restart; make it resumable
+        for job in jobs.values():
+            if job["status"] in ACTIVE_STATUSES:
+                job["status"] = "failed"
+                job["error"] = "Interrupted by restart"
+        return jobs
+
+    def _save_jobs(self):
+        try:
+            with open(JOBS_FILE, 'w') as f:
+                json.dump(self.jobs, f, indent=2)
+        except Exception as e:
+            print(f"Error saving ingestion jobs: {e}")
+
+    def _update_job(self, job, **fields):
+        with self._lock:
+            job.update(fields)
+            job["updated_at"] = datetime.now().isoformat(timespec="seconds")
+            self._save_jobs()
+
+    def get_job(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list_jobs(self, business_id=None):
+        return [j for j in self.jobs.values() if business_id is None or j["business_id"] == business_id]
+
+    def business_lock(self, business_id):
+        with self._lock:
+            return self._business_locks.setdefault(business_id, threading.Lock())
+
+    def active_job(self, business_id):
+        for job in self.jobs.values():
+            if job["business_id"] == business_id and job["status"] in ACTIVE_STATUSES:
+                return job
+        return None
+
+    def resume_job(self, job_id):
+        """Marks a failed job pending again so it can be handed to run_job."""
+        with self._lock:
+            job = self.jobs[job_id]
+            if job["status"] not in ("failed", "pending"):
+                raise IngestionConflict(f"Job is {job['status']}, only failed or pending jobs can be resumed")
+            active = self.active_job(job["business_id"])
+            if active and active is not job:
+                raise IngestionConflict(f"Business {job['business_id']} already has an active ingestion job ({active['id']})")
+            job["status"] = "pending"
+        self._update_job(job)
+        return job
+
+    def index_records(self, business_id, records, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Replaces a business's vectors with records already in memory, through
+        the same chunked upsert + delete_stale path as a job: the old vectors
+        keep serving searches until the new catalog is fully written, and only
+        one chunk of embeddings is held at a time. Hold business_lock().
+        """
+        ingest_id = f"refresh_{uuid.uuid4().hex[:12]}"
+        try:
+            for start in range(0, len(records), chunk_size):
+                chunk = records[start:start + chunk_size]
+                ids = [f"{business_id}_{ingest_id}_{start + i}" for i in range(len(chunk))]
+                self.vector_store.upsert_chunk(business_id, chunk, ids, ingest_id)
+        except Exception:
+            # Don't leave half a catalog next to the old one
+            self.vector_store.collection.delete(where={"ingest_id": ingest_id})
+            raise
+        self.vector_store.delete_stale(business_id, ingest_id)
+        answer_cache.invalidate(business_id)
+        print(f"Re-indexed {len(records)} items for business: {business_id}")
+
+    def create_sheets_job(self, business_id, sheet_id, chunk_size=DEFAULT_CHUNK_SIZE, schema=None):
+        return self._create_job(business_id, "sheets", chunk_size, sheet_id=sheet_id, schema=schema)
+
+    def create_csv_job(self, business_id, fileobj, chunk_size=DEFAULT_CHUNK_SIZE, schema=None):
+        job = self._create_job(business_id, "csv", chunk_size, schema=schema)
+        # Keep the upload on disk so the job can be resumed after a failure
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        path = os.path.join(UPLOAD_DIR, f"{job['id']}.csv")
+        with open(path, "wb") as out:
+            shutil.copyfileobj(fileobj, out)
+        self._update_job(job, file_path=path)
+        return job
+
+    def _create_job(self, business_id, source, chunk_size, **fields):
+        job_id = f"ingest_{uuid.uuid4().hex[:12]}"
+        job = {
+            "id": job_id,
+            "business_id": business_id,
+            "source": source,
+            "chunk_size": max(1, int(chunk_size)),
+            "status": "pending",
+            "next_row": 0,
+            "items_indexed": 0,
+            "chunks_done": 0,
+            "error": None,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        job.update(fields)
+        with self._lock:
+            active = self.active_job(business_id)
+            if active:
+                raise IngestionConflict(f"Business {business_id} already has an active ingestion job ({active['id']})")
+            self.jobs[job_id] = job
+        self._update_job(job)
+        return job
+
+    def _supersede_older(self, job):
+        with self._lock:
+            for other in self.jobs.values():
+                # Only one job per business is active at a time, so every other one is older
+                if other is not job and other["business_id"] == job["business_id"] and other["status"] != "superseded":
+                    other["status"] = "superseded"
+                    other["superseded_by"] = job["id"]
+                    for path in (other.get("file_path"), part_path(other["business_id"], other["id"])):
+                        if path and os.path.exists(path):
+                            os.remove(path)
+
+    def _save_snapshot(self, job, snapshot_part):
+        # Best effort: without a snapshot the next startup re-reads and re-indexes
+        try:
+            job["content_hash"] = finalize_part(job["business_id"], job.get("sheet_id"), snapshot_part)
+        except Exception as e:
+            print(f"Error saving inventory snapshot for {job['business_id']}: {e}")
+
+    def _iter_chunks(self, job, seen_names):
+        if job["source"] == "csv":
+            return iter_csv_chunks(job["file_path"], job["chunk_size"], job["next_row"], job.get("schema"), seen_names)
+        # Skip the eager full-sheet load; rows are read range by range instead
+        sheets = SheetsManager(inventory_sheet_id=job["sheet_id"], preload=False, schema=job.get("schema"))
+        return sheets.iter_inventory_chunks(job["chunk_size"], job["next_row"], seen_names=seen_names)
+
+    def run_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if not job:
+            print(f"Ingestion job {job_id} not found.")
+            return None
+        with self._lock:
+            if job["status"] not in ("pending", "failed"):
+                print(f"Ingestion job {job_id} is {job['status']}; not starting it.")
+                return job
+            active = self.active_job(job["business_id"])
+            if active and active is not job:
+                print(f"Ingestion job {job_id} not started: {active['id']} is active for {job['business_id']}.")
+                return job
+            job["status"] = "running"
+        self._update_job(job, error=None)
+
+        business_id = job["business_id"]
+        with self.business_lock(business_id):
+            return self._run(job)
+
+    def _run(self, job):
+        job_id, business_id = job["id"], job["business_id"]
+        print(f"Ingestion {job_id} for {business_id}: starting at row {job['next_row']}")
+        # Records are also streamed to a partial snapshot, which becomes the
+        # business's inventory snapshot (and content hash) once the job completes
+        snapshot_part = part_path(business_id, job_id)
+        keep_snapshot = job["next_row"] == 0 or os.path.exists(snapshot_part)
+        try:
+            # Generated SKUs number repeated names; a resume continues the count
+            seen_names = part_name_counts(snapshot_part, job.get("snapshot_bytes", 0)) if job["next_row"] else {}
+            for records, next_row in self._iter_chunks(job, seen_names):
+                # Ids derive from the item position within this job, so a
+                # resumed chunk overwrites what a failed attempt left behind.
+                start = job["items_indexed"]
+                ids = [f"{business_id}_{job_id}_{start + i}" for i in range(len(records))]
+                self.vector_store.upsert_chunk(business_id, records, ids, job_id)
+                snapshot_bytes = job.get("snapshot_bytes", 0)
+                if keep_snapshot:
+                    snapshot_bytes = append_part(snapshot_part, records, snapshot_bytes)
+                self._update_job(
+                    job,
+                    snapshot_bytes=snapshot_bytes,
+                    next_row=next_row,
+                    items_indexed=start + len(records),
+                    chunks_done=job["chunks_done"] + 1,
+                )
+                print(f"Ingestion {job_id}: {job['items_indexed']} items indexed ({next_row} rows read)")
+
+            # An empty read is treated as suspect: the job fails and the
+            # previous catalog (and the business's source) stay as they were
+            if not job["items_indexed"]:
+                raise ValueError("No items read; keeping the existing catalog")
+            # The reader only gets here after a full read, so the new catalog is
+            # complete; drop vectors from earlier runs.
+            self.vector_store.delete_stale(business_id, job_id)
+            if keep_snapshot:
+                self._save_snapshot(job, snapshot_part)
+            answer_cache.invalidate(business_id)
+            self._supersede_older(job)
+            self._update_job(job, status="completed")
+            for path in (job.get("file_path"), snapshot_part):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            if self.on_complete:
+                self.on_complete(job)
+            print(f"Ingestion {job_id} complete. {job['items_indexed']} items indexed.")
+        except Exception as e:
+            print(f"Ingestion {job_id} failed at row {job['next_row']}: {type(e).__name__}: {e}")
+            self._update_job(job, status="failed", error=f"{type(e).__name__}: {e}")
+        return job
@@ -0,0 +1,247 @@
+import hashlib
+import re
+import sys
+
+# Source column candidates for each normalized field, tried in order.
+# A business can override any of these with a "column_map" entry in its config,
+# e.g. "column_map": {"name": "Dish Name", "price": "Cost (INR)"}
+DEFAULT_SCHEMA = {
+    "sku": ["SKU", "sku", "Item Code", "id", "ID"],
+    "name": ["Item Name", "Dish Name", "item", "Item", "name", "Name"],
+    "category": ["Category", "category"],
+    "price": ["Price", "price"],
+    "stock": ["Stock", "stock", "Quantity", "quantity", "Qty"],
+}
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_OUT_OF_STOCK = {"out of stock", "sold out", "unavailable", "no", "n/a"}
+
+
+def parse_price(value):
+    """'₹1,500', '15.00', 200 -> float. None if there's no number in it."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value).replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def parse_stock(value):
+    """
+    Numeric stock -> int. Blank or free text like 'Unlimited' / 'In stock'
+    -> None (not tracked, treated as available). 'Out of stock' -> 0.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().lower()
+    if text in _OUT_OF_STOCK:
+        return 0
+    match = _NUMBER_RE.search(text.replace(",", ""))
+    return int(float(match.group())) if match else None
+
+
+def make_sku(name, occurrence=0):
+    # Stable hash of the normalized name when the sheet has no SKU column.
+    # Repeated names (e.g. the same item in two sizes) are salted with how
+    # many times the name was seen before, so every row keeps its own SKU.
+    key = name.strip().lower()
+    if occurrence:
+        key = f"{key}#{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+class InventoryRecord:
+    """One normalized inventory row. Unmapped columns are kept in `extra`."""
+    __slots__ = ("sku", "name", "category", "price", "stock", "extra")
+
+    def __init__(self, sku, name, category=None, price=None, stock=None, extra=()):
+        self.sku = sku
+        self.name = name
+        self.category = category
+        self.price = price
+        self.stock = stock
+        # Tuple of (column, value) pairs; column names are interned and shared
+        self.extra = extra
+
+    @property
+    def in_stock(self):
+        return self.stock is None or self.stock > 0
+
+    def matches(self, min_price=None, max_price=None, category=None, in_stock_only=False):
+        if min_price is not None and (self.price is None or self.price < min_price):
+            return False
+        if max_price is not None and (self.price is None or self.price > max_price):
+            return False
+        if category and (self.category or "").lower() != category.lower():
+            return False
+        if in_stock_only and not self.in_stock:
+            return False
+        return True
+
+    def search_text(self):
+        # SKUs are matched as whole tokens in InventoryStore.search, not here:
+        # a substring of a hashed SKU ("2", "50") would match unrelated items
+        parts = [
+            self.name, self.category or "",
+            "" if self.price is None else str(self.price),
+            "" if self.stock is None else str(self.stock),
+        ]
+        parts.extend(str(v) for _, v in self.extra)
+        return " ".join(parts).lower()
+
+    def to_dict(self):
+        """The item as returned to the agent."""
+        item = {"sku": self.sku, "name": self.name}
+        if self.category:
+            item["category"] = self.category
+        if self.price is not None:
+            item["price"] = self.price
+        if self.stock is not None:
+            item["stock"] = self.stock
+        item["in_stock"] = self.in_stock
+        item.update(self.extra)
+        return item
+
+    def to_metadata(self, business_id):
+        """Flat, typed Chroma metadata so vector hits need no JSON decoding."""
+        meta = {
+            "business_id": business_id,
+            "sku": self.sku,
+            "name": self.name,
+            "category": (self.category or "").lower(),
+            "in_stock": self.in_stock,
+        }
+        # Chroma metadata can't hold None; a missing key means "unknown"
+        if self.category:
+            meta["category_label"] = self.category
+        if self.price is not None:
+            meta["price"] = self.price
+        if self.stock is not None:
+            meta["stock"] = self.stock
+        for column, value in self.extra:
+            meta[f"x:{column}"] = value
+        return meta
+
+    @classmethod
+    def from_metadata(cls, meta):
+        extra = tuple((k[2:], v) for k, v in meta.items() if k.startswith("x:"))
+        return cls(
+            sku=meta.get("sku", ""),
+            name=meta.get("name", ""),
+            category=meta.get("category_label"),
+            price=meta.get("price"),
+            stock=meta.get("stock"),
+            extra=extra,
+        )
+
+
+class SchemaMapping:
+    """Resolves a business's sheet columns to normalized record fields."""
+
+    def __init__(self, overrides=None):
+        self.candidates = {field: list(cols) for field, cols in DEFAULT_SCHEMA.items()}
+        for field, column in (overrides or {}).items():
+            if field in self.candidates:
+                self.candidates[field] = [column]
+        self._resolved = {}
+
+    def _columns_for(self, headers):
+        # Rows of one sheet share headers, so resolve once per header set
+        key = tuple(headers)
+        columns = self._resolved.get(key)
+        if columns is None:
+            columns = {}
+            for field, candidates in self.candidates.items():
+                columns[field] = next((c for c in candidates if c in headers), None)
+            self._resolved[key] = columns
+        return columns
+
+    def to_record(self, row, seen_names=None):
+        """
+        `seen_names` counts generated-SKU names across the rows of one read;
+        share it between chunks so SKUs match a whole-sheet read.
+        """
+        columns = self._columns_for(row.keys())
+        mapped = {c for c in columns.values() if c}
+
+        name_col = columns["name"]
+        name = str(row[name_col]).strip() if name_col and row[name_col] != "" else ""
+        if not name:
+            # No recognizable name column: fall back to the first non-empty value
+            name = next((str(v).strip() for v in row.values() if str(v).strip()), "")
+
+        sku_col = columns["sku"]
+        if sku_col and row[sku_col] != "":
+            sku = str(row[sku_col]).strip()
+        else:
+            seen_names = {} if seen_names is None else seen_names
+            key = name.strip().lower()
+            sku = make_sku(name, seen_names.get(key, 0))
+            seen_names[key] = seen_names.get(key, 0) + 1
+
+        category_col = columns["category"]
+        category = str(row[category_col]).strip() if category_col and row[category_col] != "" else None
+
+        extra = tuple(
+            (sys.intern(str(k)), v) for k, v in row.items()
+            if k not in mapped and v != "" and v is not None
+        )
+        return InventoryRecord(
+            sku=sku,
+            name=name,
+            category=category,
+            price=parse_price(row[columns["price"]]) if columns["price"] else None,
+            stock=parse_stock(row[columns["stock"]]) if columns["stock"] else None,
+            extra=extra,
+        )
+
+    def to_records(self, rows, seen_names=None):
+        seen_names = {} if seen_names is None else seen_names
+        return [self.to_record(row, seen_names) for row in rows]
+
+
+class InventoryStore:
+    """A business's inventory as compact records with a SKU hash index."""
+
+    def __init__(self, records=()):
+        self.records = list(records)
+        self.by_sku = {r.sku: r for r in self.records}
+
+    @classmethod
+    def from_rows(cls, rows, schema=None):
+        mapping = schema if isinstance(schema, SchemaMapping) else SchemaMapping(schema)
+        return cls(mapping.to_records(rows))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def get(self, sku):
+        return self.by_sku.get(sku)
+
+    def search(self, query="", limit=None, **filters):
+        """
+        Keyword search: every query token must appear somewhere in the item
+        or equal its SKU.
+        Filters (min_price, max_price, category, in_stock_only) are applied
+        before the text match since they are cheap typed comparisons.
+        """
+        tokens = query.lower().split()
+        results = []
+        for record in self.records:
+            if not record.matches(**filters):
+                continue
+            if tokens:
+                text = record.search_text()
+                sku = record.sku.lower()
+                if not all(token in text or token == sku for token in tokens):
+                    continue
+            results.append(record)
+            if limit and len(results) >= limit:
+                break
+        return results
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from inventory_model import InventoryRecord, InventoryStore, make_sku
+
+SNAPSHOT_DIR = os.environ.get("INVENTORY_SNAPSHOT_DIR", "inventory_snapshots")
+# Bump when the record layout below changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 1
+
+
+def _pack(record):
+    return [record.sku, record.name, record.category, record.price, record.stock, [list(p) for p in record.extra]]
+
+
+def _unpack(row):
+    sku, name, category, price, stock, extra = row
+    return InventoryRecord(sku, name, category, price, stock, tuple(tuple(p) for p in extra))
+
+
+def _packed_json(record):
+    return json.dumps(_pack(record), sort_keys=True, default=str)
+
+
+def content_hash(records):
+    """Hash of the inventory contents, used to skip re-indexing unchanged catalogs."""
+    digest = hashlib.sha1()
+    for record in records:
+        digest.update(_packed_json(record).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _path(business_id):
+    return os.path.join(SNAPSHOT_DIR, f"{business_id}.json")
+
+
+def load_snapshot(business_id, sheet_id=None):
+    """
+    Returns (InventoryStore, metadata) from the local snapshot, or (None, None)
+    if there is none, it is from another snapshot version, or another sheet.
+    """
+    path = _path(business_id)
+    if not os.path.exists(path):
+        return None, None
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"Error loading inventory snapshot for {business_id}: {e}")
+        return None, None
+    if data.get("version") != SNAPSHOT_VERSION or (sheet_id and data.get("sheet_id") != sheet_id):
+        print(f"Ignoring outdated inventory snapshot for {business_id}")
+        return None, None
+    store = InventoryStore(_unpack(row) for row in data["records"])
+    meta = {k: v for k, v in data.items() if k != "records"}
+    return store, meta
+
+
+def save_snapshot(business_id, sheet_id, store, digest=None):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    data = {
+        "version": SNAPSHOT_VERSION,
+        "business_id": business_id,
+        "sheet_id": sheet_id,
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+        "content_hash": digest or content_hash(store.records),
+        "records": [_pack(r) for r in store.records],
+    }
+    # Write then rename, so a crash mid-write never leaves a truncated snapshot
+    tmp_path = _path(business_id) + ".tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, _path(business_id))
+    except Exception as e:
+        print(f"Error saving inventory snapshot for {business_id}: {e}")
+
+
+def part_path(business_id, job_id):
+    return os.path.join(SNAPSHOT_DIR, f"{business_id}.{job_id}.part")
+
+
+def append_part(path, records, offset=0):
+    """
+    Appends records to an ingestion job's partial snapshot (one packed record
+    per line) and returns the new file size. The file is first cut back to
+    `offset`, dropping lines from a chunk the job never recorded as done.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        f.truncate()
+        for record in records:
+            f.write(_packed_json(record).encode("utf-8") + b"\n")
+        return f.tell()
+
+
+def part_name_counts(path, offset):
+    """
+    Rebuilds the repeated-name counter used for generated SKUs (see
+    SchemaMapping.to_record) from the first `offset` bytes of a job's partial
+    snapshot, so a resumed job keeps numbering duplicates where it stopped.
+    """
+    counts = {}
+    if not os.path.exists(path):
+        return counts
+    read = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            read += len(line)
+            if read > offset:
+                break
+            sku, name = json.loads(line)[:2]
+            key = name.strip().lower()
+            # Rows with a SKU column value never entered the counter
+            if sku == make_sku(name, counts.get(key, 0)):
+                counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def finalize_part(business_id, sheet_id, path):
+    """
+    Turns a completed job's partial snapshot into the business's snapshot,
+    streaming line by line so the catalog is never held in memory here.
+    Returns the content hash (same as content_hash over the records).
+    """
+    digest = hashlib.sha1()
+    tmp_path = _path(business_id) + ".tmp"
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "business_id": business_id,
+        "sheet_id": sheet_id,
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(path, 'r', encoding="utf-8") as part, open(tmp_path, 'w') as f:
+        f.write(json.dumps(header)[:-1] + ', "records": [')
+        for i, line in enumerate(part):
+            line = line.rstrip("\n")
+            digest.update(line.encode("utf-8"))
+            f.write(("," if i else "") + line)
+        f.write(f'], "content_hash": "{digest.hexdigest()}"}}')
+    os.replace(tmp_path, _path(business_id))
+    os.remove(path)
+    return digest.hexdigest()
@@ -1,22 +1,30 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
 import os
+import threading
 from dotenv import load_dotenv
 
 # Import Routers
 from routers import web_chat, whatsapp, twilio_voice, admin
+from ai_agent import refresh_all_businesses
+from static_server import StaticIndex
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start accepting requests immediately (served from inventory snapshots)
+    # while Sheets is re-read and changed catalogs are re-indexed in the background.
+    threading.Thread(target=refresh_all_businesses, name="inventory-refresh", daemon=True).start()
+    yield
 
-# Mount the React build directory (static files)
-# In Docker, we'll copy frontend/dist to /app/static or similar
-# Local dev fallback: ../frontend/dist
-if os.path.exists("../frontend/dist"):
-    app.mount("/assets", StaticFiles(directory="../frontend/dist/assets"), name="assets")
+app = FastAPI(lifespan=lifespan)
+
+# Index the React build directory (static files) once at startup.
+# In Docker, frontend/dist is copied to /app/frontend/dist, matching this path.
+FRONTEND_DIST = os.environ.get("FRONTEND_DIST", "../frontend/dist")
+static_index = StaticIndex(FRONTEND_DIST)
 
 # Restarting connection to verify API status
 app.add_middleware(
@@ -39,15 +47,17 @@ def health():
 
 # Serve React App (Catch-all for SPA)
 @app.get("/{full_path:path}")
-async def serve_react_app(full_path: str):
-    # API routes are already handled above. 
-    # If a file exists in dist, serve it (e.g. vite.svg), otherwise serve index.html
-    possible_file = f"../frontend/dist/{full_path}"
-    if os.path.isfile(possible_file):
-        return FileResponse(possible_file)
-    
-    # Fallback to index.html for React Router
-    if os.path.exists("../frontend/dist/index.html"):
-        return FileResponse("../frontend/dist/index.html")
-    
+async def serve_react_app(full_path: str, request: Request):
+    # API routes are already handled above.
+    # If a file exists in dist, serve it (e.g. vite.svg); extensionless routes get index.html
+    asset = static_index.get(full_path)
+    if asset:
+        return static_index.response(
+            asset,
+            accept_encoding=request.headers.get("accept-encoding", ""),
+            if_none_match=request.headers.get("if-none-match", ""),
+        )
+
+    if static_index.assets:
+        return Response(status_code=404)
     return {"error": "Frontend not found. Did you run 'npm run build'?"}
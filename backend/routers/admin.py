@@ -1,16 +1,19 @@
-from fastapi import APIRouter, HTTPException, Form
+from fastapi import APIRouter, HTTPException, Form, UploadFile, File, BackgroundTasks
 from pydantic import BaseModel
 from typing import Optional
-from business_manager import BusinessManager
-from ai_agent import get_sheets_manager 
+from ingestion_manager import DEFAULT_CHUNK_SIZE, IngestionConflict
+from ai_agent import get_sheets_manager, admission_controller, business_manager
+import sheets_client
+from answer_cache import answer_cache
 
 router = APIRouter()
-business_manager = BusinessManager()
 
 class BusinessCreate(BaseModel):
     name: str
     type: str # retail or restaurant
     sheet_id: str
+    # Per-business settings, incl. an optional column mapping:
+    # {"column_map": {"name": "Dish Name", "price": "Cost"}}
     config: Optional[dict] = {}
 
 @router.get("/admin/businesses")
@@ -18,8 +21,84 @@ def list_businesses():
     return business_manager.list_businesses()
 
 @router.post("/admin/businesses")
-def create_business(biz: BusinessCreate):
-    return business_manager.create_business(biz.dict())
+def create_business(biz: BusinessCreate, background_tasks: BackgroundTasks):
+    """
+    Creates the business and starts its initial ingestion in the background;
+    poll /admin/ingest/{ingest_job_id} for progress.
+    """
+    business, job = business_manager.create_business(biz.dict())
+    if job:
+        background_tasks.add_task(business_manager.ingestion.run_job, job["id"])
+    return {**business, "ingest_job_id": job["id"] if job else None}
+
+@router.post("/admin/businesses/{business_id}/ingest")
+def ingest_from_sheet(business_id: str, background_tasks: BackgroundTasks, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Re-ingest the business's Google Sheet in chunks. Runs in the background;
+    poll /admin/ingest/{job_id} for progress.
+    """
+    biz = business_manager.get_business(business_id)
+    if not biz:
+        raise HTTPException(status_code=404, detail="Business not found")
+    try:
+        job = business_manager.ingestion.create_sheets_job(business_id, biz["sheet_id"], chunk_size, schema=business_manager.column_map(biz))
+    except IngestionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    background_tasks.add_task(business_manager.ingestion.run_job, job["id"])
+    return job
+
+@router.post("/admin/businesses/{business_id}/ingest/csv")
+def ingest_from_csv(business_id: str, background_tasks: BackgroundTasks, file: UploadFile = File(...), chunk_size: int = Form(DEFAULT_CHUNK_SIZE)):
+    biz = business_manager.get_business(business_id)
+    if not biz:
+        raise HTTPException(status_code=404, detail="Business not found")
+    try:
+        job = business_manager.ingestion.create_csv_job(business_id, file.file, chunk_size, schema=business_manager.column_map(biz))
+    except IngestionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    background_tasks.add_task(business_manager.ingestion.run_job, job["id"])
+    return job
+
+@router.get("/admin/ingest")
+def list_ingest_jobs(business_id: Optional[str] = None):
+    return business_manager.ingestion.list_jobs(business_id)
+
+@router.get("/admin/ingest/{job_id}")
+def get_ingest_job(job_id: str):
+    job = business_manager.ingestion.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
+
+@router.post("/admin/ingest/{job_id}/resume")
+def resume_ingest_job(job_id: str, background_tasks: BackgroundTasks):
+    job = business_manager.ingestion.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    try:
+        job = business_manager.ingestion.resume_job(job_id)
+    except IngestionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    background_tasks.add_task(business_manager.ingestion.run_job, job_id)
+    return job
+
+@router.get("/admin/admission")
+async def admission_stats():
+    # Async so it reads the controller's state on the event loop, where it is updated
+    return admission_controller.stats()
+
+@router.get("/admin/sheets/quota")
+def sheets_quota():
+    return sheets_client.quota.stats()
+
+@router.get("/admin/answer-cache")
+def answer_cache_stats():
+    return answer_cache.stats()
+
+@router.post("/admin/answer-cache/{business_id}/invalidate")
+def invalidate_answer_cache(business_id: str):
+    answer_cache.invalidate(business_id)
+    return answer_cache.stats()
 
 @router.get("/orders")
 def get_orders(business_id: str = "electronics_default"):
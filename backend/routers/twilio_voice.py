@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Request, Response, Form
 from typing import Optional
-from twilio.twiml.voice_response import VoiceResponse, Gather
-from ai_agent import get_agent_response
+from ai_agent import get_agent_response, AdmissionRejected
 
 router = APIRouter()
 
 @router.post("/voice")
-def voice_webhook(SpeechResult: Optional[str] = Form(None), CallSid: str = Form(...)):
+async def voice_webhook(SpeechResult: Optional[str] = Form(None), CallSid: str = Form(...)):
     """
     Handle incoming Voice calls from Twilio
     """
+    # Imported on first call to keep app startup fast
+    from twilio.twiml.voice_response import VoiceResponse, Gather
+
     user_speech = SpeechResult
     call_sid = CallSid
     
@@ -26,7 +28,11 @@ def voice_webhook(SpeechResult: Optional[str] = Form(None), CallSid: str = Form(
         print(f"Voice Input from {call_sid}: {user_speech}")
         
         # Get response from AI Agent
-        ai_reply = get_agent_response(call_sid, user_speech, business_id="electronics_default")
+        try:
+            ai_reply = await get_agent_response(call_sid, user_speech, business_id="electronics_default", channel="voice")
+        except AdmissionRejected as e:
+            print(f"Voice turn shed: {e.reason}")
+            ai_reply = "Please hold on, we're a little busy. Could you say that again?"
         print(f"AI Voice Reply: {ai_reply}")
         
         # Respond and wait for next input
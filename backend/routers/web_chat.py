@@ -2,15 +2,14 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from pydantic import BaseModel
 from typing import Optional
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import io
 import os
 import base64
-from openai import OpenAI
 from tts_wrapper import get_google_tts
-from ai_agent import get_agent_response
+from ai_agent import get_agent_response, get_openai_client, AdmissionRejected
 
 router = APIRouter()
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
 
 class ChatRequest(BaseModel):
     message: str
@@ -22,8 +21,16 @@ class TTSRequest(BaseModel):
     text: str
     language: str = "en-US"
 
+def _too_busy(rejection):
+    print(f"Chat turn shed: {rejection.reason}")
+    return HTTPException(
+        status_code=429,
+        detail="We're handling a lot of requests right now. Please try again in a moment.",
+        headers={"Retry-After": str(max(1, round(rejection.retry_after)))}
+    )
+
 @router.post("/chat")
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     image_url = None
     if request.image:
         if request.image.startswith("data:image"):
@@ -31,53 +38,64 @@ def chat(request: ChatRequest):
         else:
              image_url = request.image
 
-    ai_text = get_agent_response(request.session_id, request.message, image_url=image_url, business_id=request.business_id)
-    return {"response": ai_text}
-
-@router.post("/process-audio")
-def process_audio(file: UploadFile = File(...), session_id: str = Form(...), business_id: str = Form("electronics_default")):
     try:
-        import tempfile
-        import shutil
+        ai_text = await get_agent_response(request.session_id, request.message, image_url=image_url, business_id=request.business_id, channel="web")
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+    return {"response": ai_text}
 
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-        
-        with open(tmp_path, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1", 
-                file=audio_file
-            )
-        
-        os.remove(tmp_path)
-        
-        user_text = transcript.text
-        print(f"User: {user_text}")
-    except Exception as e:
-        print(f"STT Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def _transcribe(file):
+    import tempfile
+    import shutil
 
-    ai_text = get_agent_response(session_id, user_text, business_id=business_id)
-    print(f"AI: {ai_text}")
+    suffix = os.path.splitext(file.filename)[1]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        tmp_path = tmp.name
+    
+    with open(tmp_path, "rb") as audio_file:
+        transcript = get_openai_client().audio.transcriptions.create(
+            model="whisper-1", 
+            file=audio_file
+        )
+    
+    os.remove(tmp_path)
+    return transcript.text
 
-    audio_content = None
+def _synthesize(ai_text):
     try:
-        audio_content = get_google_tts(ai_text, "en-US") 
+        return get_google_tts(ai_text, "en-US") 
     except Exception as e:
         print(f"Google TTS Error: {e}. Falling back to OpenAI.")
         try:
-             response = client.audio.speech.create(
+             response = get_openai_client().audio.speech.create(
                 model="tts-1",
                 voice="alloy",
                 input=ai_text
             )
-             audio_content = response.content
+             return response.content
         except Exception as oe:
              print(f"OpenAI TTS Error: {oe}")
              raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/process-audio")
+async def process_audio(file: UploadFile = File(...), session_id: str = Form(...), business_id: str = Form("electronics_default")):
+    # Speech-to-text and TTS block, so they run in the threadpool; the agent
+    # turn waits for admission on the event loop without holding a thread.
+    try:
+        user_text = await run_in_threadpool(_transcribe, file)
+        print(f"User: {user_text}")
+    except Exception as e:
+        print(f"STT Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    try:
+        ai_text = await get_agent_response(session_id, user_text, business_id=business_id, channel="web")
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+    print(f"AI: {ai_text}")
+
+    audio_content = await run_in_threadpool(_synthesize, ai_text)
     audio_base64 = base64.b64encode(audio_content).decode('utf-8')
     
     return {
@@ -94,7 +112,7 @@ def tts_endpoint(request: TTSRequest):
     except Exception as e:
         print(f"Google TTS Error: {e}. Falling back to OpenAI.")
         try:
-            response = client.audio.speech.create(
+            response = get_openai_client().audio.speech.create(
                 model="tts-1",
                 voice="alloy",
                 input=request.text
@@ -1,21 +1,27 @@
 from fastapi import APIRouter, Request, Response, Form
-from twilio.twiml.messaging_response import MessagingResponse
-from ai_agent import get_agent_response
+from ai_agent import get_agent_response, AdmissionRejected
 
 router = APIRouter()
 
 @router.post("/whatsapp")
-def whatsapp_webhook(Body: str = Form(""), From: str = Form("")):
+async def whatsapp_webhook(Body: str = Form(""), From: str = Form("")):
     """
     Handle incoming WhatsApp messages from Twilio
     """
+    # Imported on first call to keep app startup fast
+    from twilio.twiml.messaging_response import MessagingResponse
+
     incoming_msg = Body.strip()
     sender_id = From
 
     print(f"WhatsApp Message from {sender_id}: {incoming_msg}")
 
     # Use the sender_id as the session_id so the conversation persists for this user
-    response_text = get_agent_response(sender_id, incoming_msg, business_id="electronics_default")
+    try:
+        response_text = await get_agent_response(sender_id, incoming_msg, business_id="electronics_default", channel="whatsapp")
+    except AdmissionRejected as e:
+        print(f"WhatsApp turn shed: {e.reason}")
+        response_text = "We're a bit busy right now. Please hold on and send your message again in a moment."
 
     # Create Twilio XML response
     twilio_resp = MessagingResponse()
@@ -0,0 +1,118 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+import gspread
+from gspread.exceptions import APIError
+from oauth2client.service_account import ServiceAccountCredentials
+from admission_control import TokenBucket
+
+SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+# Google's default Sheets quota is 60 requests/minute per user (the service
+# account), shared by every business using it.
+REQUESTS_PER_MINUTE = float(os.environ.get("SHEETS_REQUESTS_PER_MINUTE", 60))
+BURST = int(os.environ.get("SHEETS_BURST", 10))
+MAX_RETRIES = int(os.environ.get("SHEETS_MAX_RETRIES", 5))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# A 429 means the request was rejected before doing anything, so it is safe
+# to retry even for writes; a 5xx may arrive after the write already happened.
+RATE_LIMIT_STATUS = 429
+
+
+class SheetsQuota:
+    """
+    Process-wide budget for Sheets API calls. Every call goes through `call`,
+    which waits for a token, then retries quota/5xx errors with jittered
+    exponential backoff. Usage is tracked per spreadsheet for capacity sizing.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST, max_retries=MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._recent = deque()  # timestamps of requests in the last 60s
+        self.counters = {"requests": 0, "retries": 0, "rate_limited": 0, "failed": 0, "throttle_wait_seconds": 0.0}
+        self.by_sheet = {}
+
+    def _acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._bucket.time_until_token(now)
+                if delay == 0:
+                    self._bucket.take()
+                    self._recent.append(now)
+                    self.counters["throttle_wait_seconds"] += waited
+                    return
+            time.sleep(delay)
+            waited += delay
+
+    def call(self, fn, *args, sheet_id=None, retry_server_errors=True, **kwargs):
+        """
+        Pass retry_server_errors=False for non-idempotent writes (appends):
+        those are only retried on 429.
+        """
+        retryable = RETRYABLE_STATUS if retry_server_errors else {RATE_LIMIT_STATUS}
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            with self._lock:
+                self.counters["requests"] += 1
+                if sheet_id:
+                    self.by_sheet[sheet_id] = self.by_sheet.get(sheet_id, 0) + 1
+            try:
+                return fn(*args, **kwargs)
+            except APIError as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status not in retryable or attempt == self.max_retries:
+                    with self._lock:
+                        self.counters["failed"] += 1
+                    raise
+                with self._lock:
+                    self.counters["retries"] += 1
+                    if status == RATE_LIMIT_STATUS:
+                        self.counters["rate_limited"] += 1
+                # Full jitter: sleep a random amount up to the exponential cap
+                backoff = random.uniform(0, min(32.0, 2 ** attempt))
+                print(f"Sheets API {status}, retrying in {backoff:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(backoff)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            uptime_min = max((now - self._started) / 60.0, 1 / 60.0)
+            tenants = len(self.by_sheet)
+            per_tenant = self.counters["requests"] / uptime_min / tenants if tenants else 0.0
+            return {
+                "limit_per_minute": self.requests_per_minute,
+                "used_last_minute": len(self._recent),
+                "uptime_minutes": round(uptime_min, 2),
+                **{k: round(v, 2) if isinstance(v, float) else v for k, v in self.counters.items()},
+                "requests_by_sheet": dict(self.by_sheet),
+                "avg_requests_per_tenant_per_minute": round(per_tenant, 3),
+                # How many tenants at today's average rate one service account can carry
+                "estimated_tenant_capacity": int(self.requests_per_minute / per_tenant) if per_tenant else None,
+            }
+
+
+quota = SheetsQuota()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(creds_file="credentials.json"):
+    """One authorized gspread client per credentials file, shared by all businesses."""
+    with _clients_lock:
+        client = _clients.get(creds_file)
+        if client is None:
+            creds = ServiceAccountCredentials.from_json_keyfile_name(creds_file, SCOPES)
+            client = gspread.authorize(creds)
+            _clients[creds_file] = client
+        return client
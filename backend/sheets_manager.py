@@ -1,64 +1,102 @@
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import os
 import datetime
 import json
-
-SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+import time
+from inventory_model import InventoryStore, SchemaMapping
+import sheets_client
 
 class SheetsManager:
-    def __init__(self, inventory_sheet_id, orders_sheet_name="Orders", creds_file="credentials.json"):
-        self.inventory_data = [] # Cache inventory
+    def __init__(self, inventory_sheet_id, orders_sheet_name="Orders", creds_file="credentials.json", preload=True, schema=None):
+        # Per-business column mapping (see inventory_model.DEFAULT_SCHEMA)
+        self.schema = SchemaMapping(schema)
+        self.inventory = InventoryStore() # Cache inventory
         self.creds_file = creds_file
         self.inventory_sheet_id = inventory_sheet_id
         self.orders_sheet_name = orders_sheet_name
         self.client = None
+        self._spreadsheet = None
+        self._tab_titles = []
+        self._row_counts = {}
+        # time.monotonic() of the last successful read of the inventory tab
+        self.refreshed_at = None
         
         if os.path.exists(creds_file):
-            self.connect()
+            self.connect(preload=preload)
         else:
             print("Warning: credentials.json not found. Using Mock Data.")
-            self.inventory_data = [
+            self.inventory = InventoryStore.from_rows([
                 {"item": "Switch", "category": "Electrical", "price": 50},
                 {"item": "Fan", "category": "Electrical", "price": 1500},
                 {"item": "Wire (1m)", "category": "Electrical", "price": 20},
                 {"item": "Plug", "category": "Electrical", "price": 30},
                 {"item": "Pipe", "category": "Hardware", "price": 100},
                 {"item": "LED Bulb", "category": "Lighting", "price": 200},
-            ]
+            ], self.schema)
 
-    def connect(self):
+    def connect(self, preload=True):
         try:
-            creds = ServiceAccountCredentials.from_json_keyfile_name(self.creds_file, SCOPES)
-            self.client = gspread.authorize(creds)
+            self.client = sheets_client.get_client(self.creds_file)
             print("Connected to Google Sheets")
-            self.refresh_inventory()
+            if preload:
+                self.refresh_inventory()
         except Exception as e:
             print(f"Error connecting to sheets: {e}")
 
+    def _call(self, fn, *args, retry_server_errors=True, **kwargs):
+        # All API calls share the process-wide quota and retry policy
+        return sheets_client.quota.call(
+            fn, *args, sheet_id=self.inventory_sheet_id, retry_server_errors=retry_server_errors, **kwargs
+        )
+
+    def _open(self):
+        # Open by Key (ID) once and remember the tab names and grid sizes,
+        # instead of re-fetching spreadsheet metadata on every refresh and order.
+        if self._spreadsheet is None:
+            spreadsheet = self._call(self.client.open_by_key, self.inventory_sheet_id)
+            worksheets = self._call(spreadsheet.worksheets)
+            self._tab_titles = [ws.title for ws in worksheets]
+            self._row_counts = {ws.title: ws.row_count for ws in worksheets}
+            print(f"DEBUG: Available worksheets: {self._tab_titles}")
+            self._spreadsheet = spreadsheet
+        return self._spreadsheet
+
+    def _inventory_tab(self):
+        self._open()
+        if "inventory" in self._tab_titles:
+            return "inventory"
+        print("ERROR: Worksheet 'inventory' not found. Falling back to first sheet.")
+        return self._tab_titles[0]
+
+    def batch_read(self, ranges):
+        """Reads several A1 ranges (or whole tabs) in a single values.batchGet call."""
+        spreadsheet = self._open()
+        response = self._call(spreadsheet.values_batch_get, ranges)
+        return [vr.get("values", []) for vr in response.get("valueRanges", [])]
+
+    def _rows_to_dicts(self, headers, values):
+        # Same shape as gspread's get_all_records: padded, numericised, blanks skipped
+        rows = []
+        for raw in values:
+            if not any(str(v).strip() for v in raw):
+                continue
+            raw = gspread.utils.numericise_all(list(raw) + [""] * (len(headers) - len(raw)))
+            rows.append(dict(zip(headers, raw)))
+        return rows
+
     def refresh_inventory(self):
         if not self.client: return
         try:
-            # Open by Key (ID)
-            spreadsheet = self.client.open_by_key(self.inventory_sheet_id)
-            
-            # Debug: List all worksheets
-            worksheets = spreadsheet.worksheets()
-            print(f"DEBUG: Available worksheets: {[ws.title for ws in worksheets]}")
-
-            try:
-                sheet = spreadsheet.worksheet("inventory")
-                self.inventory_data = sheet.get_all_records()
-                print(f"DEBUG: Inventory successfully loaded. {len(self.inventory_data)} items found.")
-            except gspread.WorksheetNotFound:
-                print("ERROR: Worksheet 'inventory' not found. Falling back to first sheet.")
-                sheet = spreadsheet.sheet1
-                self.inventory_data = sheet.get_all_records()
-                print(f"DEBUG: Inventory refreshed from first worksheet: '{sheet.title}'. {len(self.inventory_data)} items found.")
+            tab = self._inventory_tab()
+            values, = self.batch_read([f"'{tab}'"])
+            rows = self._rows_to_dicts(values[0], values[1:]) if values else []
+            self.inventory = InventoryStore.from_rows(rows, self.schema)
+            self.refreshed_at = time.monotonic()
+            print(f"DEBUG: Inventory loaded from worksheet '{tab}'. {len(self.inventory)} items found.")
 
             # Print first 3 items to verify structure
-            if self.inventory_data:
-                print(f"DEBUG: First 3 items sample: {self.inventory_data[:3]}")
+            if self.inventory:
+                print(f"DEBUG: First 3 items sample: {[r.to_dict() for r in self.inventory.records[:3]]}")
             else:
                 print("DEBUG: Inventory is EMPTY!")
 
@@ -68,31 +106,62 @@ class SheetsManager:
             import traceback
             traceback.print_exc()
 
-    def search_inventory(self, query):
+    def iter_inventory_chunks(self, chunk_size=500, start_row=0, chunks_per_call=4, seen_names=None):
+        """
+        Streams inventory `chunk_size` rows at a time, reading one sheet range
+        per chunk instead of the whole sheet (several chunks per batchGet call).
+        Yields (records, next_row) where next_row is the data-row offset
+        (after the header) to resume from. The generator only finishes
+        normally once every row of the tab has been read. Pass the
+        `seen_names` of the rows before `start_row` when resuming, so
+        generated SKUs match a whole-sheet read.
+        """
+        if not self.client:
+            records = self.inventory.records
+            for i in range(start_row, len(records), chunk_size):
+                yield records[i:i + chunk_size], min(i + chunk_size, len(records))
+            return
+
+        tab = self._inventory_tab()
+        # The API drops trailing blank rows from each range, so a short range
+        # says nothing about where the data ends. Read up to the grid size
+        # (gridProperties.rowCount) instead; blank ranges in between are skipped.
+        last_row = self._row_counts.get(tab, 0)
+        headers = None
+        seen_names = {} if seen_names is None else seen_names
+        # Sheet row 1 is the header, so data row N lives on sheet row N + 2
+        first = start_row + 2
+        while headers is None or first <= last_row:
+            end = max(first, min(first + chunk_size * chunks_per_call, last_row + 1))
+            bounds = [(f, min(f + chunk_size - 1, last_row)) for f in range(first, end, chunk_size)]
+            ranges = [f"'{tab}'!{f}:{l}" for f, l in bounds]
+            if headers is None:
+                # Fetch the header row in the same call as the first chunks
+                header_values, *chunk_values = self.batch_read([f"'{tab}'!1:1"] + ranges)
+                headers = header_values[0] if header_values else []
+                if not headers:
+                    # Never report an empty catalog: callers drop vectors after a complete read
+                    raise ValueError(f"Worksheet '{tab}' has no header row")
+            else:
+                chunk_values = self.batch_read(ranges)
+
+            for (f, l), values in zip(bounds, chunk_values):
+                yield self.schema.to_records(self._rows_to_dicts(headers, values), seen_names), l - 1
+            if not bounds:
+                return
+            first = bounds[-1][1] + 1
+
+    def search_inventory(self, query, **filters):
         # Mock Inventory for Pizza Demo (to allow testing without a new Sheet)
         if "pizza" in query.lower():
             return [{"Item": "Pepperoni Pizza", "Price": "15.00", "Stock": "Unlimited"}]
         if "pasta" in query.lower():
              return [{"Item": "Spaghetti Carbonara", "Price": "12.00", "Stock": "Unlimited"}]
 
-        print(f"DEBUG: Searching inventory for: '{query}'")
-        # fuzzy search or simple checking
-        query = query.lower()
-        query_tokens = query.split() # ['usha', 'fan']
-        
-        results = []
-        for item in self.inventory_data:
-            # Check if ANY value in the item dict contains ALL tokens
-            # e.g. if item is "Usha Wall Fan", it contains 'usha' AND 'fan'
-            
-            # Create a localized string of the entire item for searching
-            # e.g. "Usha Wall Fan Electrical 1500"
-            item_str = " ".join([str(v).lower() for v in item.values()])
-            
-            # Check if all tokens search query tokens are present in the item string
-            if all(token in item_str for token in query_tokens):
-                results.append(item)
-        
+        print(f"DEBUG: Searching inventory for: '{query}' (filters: {filters})")
+        # Every query token must appear in the item, e.g. 'usha fan' matches "Usha Wall Fan"
+        results = [record.to_dict() for record in self.inventory.search(query, **filters)]
+
         print(f"DEBUG: Found {len(results)} matches for '{query}'")
         return results
 
@@ -102,15 +171,22 @@ class SheetsManager:
             return True
             
         try:
-            # Open the same spreadsheet by ID, then find the specific 'Orders' tab
-            sheet = self.client.open_by_key(self.inventory_sheet_id).worksheet("Orders")
+            # Append to the 'Orders' tab of the same spreadsheet, without a worksheet lookup
+            spreadsheet = self._open()
             
             # Assuming order_details is a list of items. We want to format it nicely.
             # Columns: Timestamp, Order Content, Status
             timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             items_str = ", ".join([f"{item['quantity']}x {item['name']}" for item in order_details['items']])
             row = [timestamp, items_str, "Confirmed", str(order_details)]
-            sheet.append_row(row)
+            self._call(
+                spreadsheet.values_append,
+                f"'{self.orders_sheet_name}'!A1",
+                params={"valueInputOption": "RAW"},
+                body={"values": [row]},
+                # An append that 5xx'd may still have landed; retrying could record the order twice
+                retry_server_errors=False
+            )
             return True
         except Exception as e:
             print(f"Error adding order: {e}")
@@ -121,8 +197,8 @@ class SheetsManager:
             return [{"timestamp": "N/A", "items": "Mock Order", "status": "Mock", "raw": "{}"}]
             
         try:
-            sheet = self.client.open_by_key(self.inventory_sheet_id).worksheet("Orders")
-            return sheet.get_all_records()
+            values, = self.batch_read([f"'{self.orders_sheet_name}'"])
+            return self._rows_to_dicts(values[0], values[1:]) if values else []
         except Exception as e:
             print(f"Error fetching orders: {e}")
             return []
@@ -0,0 +1,116 @@
+"""
+Reports where cold-start time goes: import cost per module (via
+`python -X importtime`) and the init cost of each lazily created client.
+Every measurement runs in a fresh interpreter so nothing is pre-warmed.
+
+    cd backend
+    python startup_benchmark.py            # imports + lazy inits
+    python startup_benchmark.py --top 25   # show more modules
+    python startup_benchmark.py --no-init  # imports only (no network/clients)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Backend modules, reported individually regardless of rank
+APP_MODULES = [
+    "main", "ai_agent", "business_manager", "sheets_manager", "sheets_client", "vector_store",
+    "embedding_service", "ingestion_manager", "inventory_model", "inventory_snapshot",
+    "admission_control", "answer_cache", "static_server", "tts_wrapper",
+]
+
+# Runs in a child interpreter: import the app, then time each lazy initializer
+INIT_SCRIPT = r"""
+import json, time
+t0 = time.perf_counter()
+import main
+results = {"import main": time.perf_counter() - t0}
+
+import ai_agent, tts_wrapper, embedding_service
+
+def business_snapshots():
+    for biz in ai_agent.business_manager.list_businesses():
+        ai_agent.get_sheets_manager(biz["id"])
+
+steps = [
+    ("openai client", ai_agent.get_openai_client),
+    ("google tts client", tts_wrapper._get_client),
+    ("sheets managers (from snapshots)", business_snapshots),
+    ("vector store (chromadb)", lambda: ai_agent.business_manager.vector_store),
+    ("embedding service (worker pool)", lambda: embedding_service.get_embedding_service().embed_query("warm up")),
+]
+for name, fn in steps:
+    t = time.perf_counter()
+    try:
+        fn()
+        results[name] = time.perf_counter() - t
+    except Exception as e:
+        results[name] = f"error: {type(e).__name__}: {e}"
+print("__RESULTS__" + json.dumps(results))
+"""
+
+
+def measure_imports():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nesting is shown by leading spaces on the name
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    if proc.returncode != 0:
+        last_error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "unknown error"
+        print(f"Warning: 'import main' failed ({last_error}); partial results below.")
+    return modules
+
+
+def measure_inits():
+    proc = subprocess.run([sys.executable, "-c", INIT_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("__RESULTS__"):
+            return json.loads(line[len("__RESULTS__"):])
+    tail = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+    return {"import main": f"error: {tail}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="number of top-level packages to list")
+    parser.add_argument("--no-init", action="store_true", help="skip the lazy client init measurements")
+    args = parser.parse_args()
+
+    modules = measure_imports()
+    # Top-level packages only: their cumulative time includes their submodules
+    packages = sorted(
+        ((name, cum) for name, (_, cum) in modules.items() if "." not in name and name not in APP_MODULES),
+        key=lambda item: item[1], reverse=True
+    )
+    print(f"\nImport cost: top {args.top} third-party/stdlib packages (cumulative ms)")
+    for name, cum in packages[:args.top]:
+        print(f"  {name:<40} {cum / 1000:8.1f}")
+
+    print("\nImport cost: app modules (self ms / cumulative ms)")
+    for name in APP_MODULES:
+        if name in modules:
+            self_us, cum = modules[name]
+            print(f"  {name:<40} {self_us / 1000:8.1f} {cum / 1000:8.1f}")
+        else:
+            print(f"  {name:<40} {'(not imported at startup)':>17}")
+
+    if not args.no_init:
+        print("\nInit cost (ms, fresh interpreter, in order)")
+        for name, value in measure_inits().items():
+            shown = f"{value * 1000:8.1f}" if isinstance(value, float) else value
+            print(f"  {name:<40} {shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Hashed Vite build output never changes under the same name
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Everything else (index.html, vite.svg) must be revalidated so deploys show up
+REVALIDATE_CACHE = "no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+MIN_COMPRESS_SIZE = 1024
+
+
+class StaticAsset:
+    __slots__ = ("path", "media_type", "etag", "cache_control", "variants")
+
+    def __init__(self, path, media_type, etag, cache_control, variants):
+        self.path = path
+        self.media_type = media_type
+        self.etag = etag
+        self.cache_control = cache_control
+        # Content-Encoding -> body bytes; "identity" is always present
+        self.variants = variants
+
+
+class StaticIndex:
+    """
+    Indexes a built frontend directory once at startup: file bodies, strong
+    ETags and precompressed gzip/brotli variants are all computed up front,
+    so serving a request is a dict lookup instead of filesystem work.
+    """
+
+    def __init__(self, root_dir, index_file="index.html"):
+        self.root_dir = root_dir
+        self.index_file = index_file
+        self.assets = {}
+        if os.path.isdir(root_dir):
+            self._build()
+        else:
+            print(f"Warning: static directory {root_dir} not found. Frontend will not be served.")
+
+    def _build(self):
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for filename in filenames:
+                if filename.endswith((".gz", ".br")):
+                    # Prebuilt variants are picked up alongside their source file
+                    continue
+                full_path = os.path.join(dirpath, filename)
+                rel_path = os.path.relpath(full_path, self.root_dir).replace(os.sep, "/")
+                self.assets[rel_path] = self._load(full_path, rel_path)
+        total = sum(len(v) for a in self.assets.values() for v in a.variants.values())
+        print(f"Static index built: {len(self.assets)} files, {total / 1024:.0f} KiB incl. compressed variants.")
+
+    def _load(self, full_path, rel_path):
+        with open(full_path, "rb") as f:
+            body = f.read()
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        cache_control = IMMUTABLE_CACHE if rel_path.startswith("assets/") else REVALIDATE_CACHE
+
+        variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES):
+            variants["gzip"] = self._read_prebuilt(full_path + ".gz") or gzip.compress(body, compresslevel=9, mtime=0)
+            prebuilt_br = self._read_prebuilt(full_path + ".br")
+            if prebuilt_br:
+                variants["br"] = prebuilt_br
+            elif brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            # Keep only variants that actually save bytes
+            variants = {enc: data for enc, data in variants.items() if enc == "identity" or len(data) < len(body)}
+        return StaticAsset(rel_path, media_type, etag, cache_control, variants)
+
+    def _read_prebuilt(self, path):
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def get(self, path):
+        """
+        Returns the asset for a request path, falling back to index.html for
+        SPA routes. Missing hashed assets and other file-like paths get None
+        (a 404), not the HTML shell served as JS/CSS.
+        """
+        path = path.lstrip("/")
+        asset = self.assets.get(path)
+        if asset is not None:
+            return asset
+        if path.startswith("assets/") or os.path.splitext(path)[1]:
+            return None
+        return self.assets.get(self.index_file)
+
+    def response(self, asset, accept_encoding="", if_none_match=""):
+        encoding = _choose_encoding(accept_encoding, asset.variants)
+        # Strong ETags are per representation, so each encoding gets its own
+        etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": asset.cache_control,
+        }
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if if_none_match and _etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.variants[encoding], media_type=asset.media_type, headers=headers)
+
+
+def _etag_matches(etag, if_none_match):
+    if if_none_match.strip() == "*":
+        return True
+    # Compare opaque tags; a W/ prefix doesn't matter for If-None-Match
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
+
+
+def _choose_encoding(accept_encoding, variants):
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    # Prefer brotli (smallest), then gzip
+    for encoding in ("br", "gzip"):
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in variants and q > 0:
+            return encoding
+    return "identity"
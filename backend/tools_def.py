@@ -10,6 +10,22 @@ TOOLS = [
                     "query": {
                         "type": "string",
                         "description": "The search query for the item"
+                    },
+                    "min_price": {
+                        "type": "number",
+                        "description": "Optional minimum price, e.g. for 'above 500'"
+                    },
+                    "max_price": {
+                        "type": "number",
+                        "description": "Optional maximum price, e.g. for 'under 20'"
+                    },
+                    "category": {
+                        "type": "string",
+                        "description": "Optional exact category to restrict the search to"
+                    },
+                    "in_stock_only": {
+                        "type": "boolean",
+                        "description": "Only return items that are currently in stock"
                     }
                 },
                 "required": ["query"]
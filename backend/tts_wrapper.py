@@ -1,17 +1,27 @@
 import os
-from google.cloud import texttospeech
 
 # Load credentials explicitly ideally, or rely on GOOGLE_APPLICATION_CREDENTIALS
 # We will use the file path 'credentials.json' already in backend/
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "credentials.json"
 
-client = texttospeech.TextToSpeechClient()
+# The google-cloud-texttospeech import and client are created on first use,
+# not at import time, to keep app startup fast.
+_client = None
+
+def _get_client():
+    global _client
+    if _client is None:
+        from google.cloud import texttospeech
+        _client = texttospeech.TextToSpeechClient()
+    return _client
 
 def get_google_tts(text: str, language_code: str = "en-US") -> bytes:
     """
     Synthesize speech using Google Cloud TTS.
     Returns: Bytes of MP3 audio
     """
+    from google.cloud import texttospeech
+    client = _get_client()
     
     # Map friendly locale to Google Voice names
     # See: https://cloud.google.com/text-to-speech/docs/voices
@@ -1,20 +1,36 @@
-import chromadb
 import uuid
 import json
+from embedding_service import get_embedding_service, PRIORITY_BULK
+from inventory_model import InventoryRecord
+from answer_cache import answer_cache
 
 class VectorStoreManager:
     def __init__(self, persistence_path="./chroma_db"):
+        # Imported here: chromadb is one of the slowest imports in the app
+        import chromadb
         self.client = chromadb.PersistentClient(path=persistence_path)
         # Get or create collection
         self.collection = self.client.get_or_create_collection(name="inventory")
+        self._embedder = None
 
-    def index_inventory(self, business_id, items):
+    @property
+    def embedder(self):
+        # Embeddings are computed by the shared worker pool, not on the request thread.
+        # The pool is only started once something actually needs an embedding.
+        if self._embedder is None:
+            self._embedder = get_embedding_service()
+        return self._embedder
+
+    def has_business(self, business_id):
+        return bool(self.collection.get(where={"business_id": business_id}, limit=1, include=[])["ids"])
+
+    def index_inventory(self, business_id, records):
         """
         Re-indexes the inventory for a specific business.
         1. Deletes existing items for this business_id.
         2. Adds new items with metadata.
         """
-        print(f"Indexing {len(items)} items for business: {business_id}")
+        print(f"Indexing {len(records)} items for business: {business_id}")
         
         # 1. Delete existing
         try:
@@ -22,67 +38,134 @@ class VectorStoreManager:
         except Exception:
             pass # Collection might be empty or business not found, which is fine
 
-        if not items:
+        if not records:
             return
 
         documents = []
         metadatas = []
         ids = []
 
-        for item in items:
-            # Create a rich text representation for embedding dynamically
-            # This handles different schemas (e.g. 'Item Name' vs 'Dish Name')
-            doc_parts = []
-            
-            # Priority fields to ensure they appear first (optional, but good for some models)
-            priority_keys = ['Item Name', 'Dish Name', 'item', 'name', 'Category', 'category']
-            
-            for key in priority_keys:
-                if key in item and item[key]:
-                    doc_parts.append(f"{key}: {item[key]}")
-            
-            # Add remaining fields
-            for k, v in item.items():
-                if k not in priority_keys and v:
-                     doc_parts.append(f"{k}: {v}")
-            
-            doc_text = ". ".join(doc_parts)
-            
-            # Metadata for filtering and retrieval
-            meta = {
-                "business_id": business_id,
-                "json_data": json.dumps(item) # Store full item data to return on search
-            }
-            
-            documents.append(doc_text)
-            metadatas.append(meta)
+        for record in records:
+            documents.append(self._build_document(record))
+            metadatas.append(record.to_metadata(business_id))
             ids.append(f"{business_id}_{uuid.uuid4()}")
 
-        # 2. Add new items
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # 2. Embed (bulk priority, so live searches go first) and add new items
+        embeddings = self.embedder.embed(documents, priority=PRIORITY_BULK)
+        step = self.max_batch_size
+        for i in range(0, len(ids), step):
+            self.collection.add(
+                documents=documents[i:i + step],
+                embeddings=embeddings[i:i + step],
+                metadatas=metadatas[i:i + step],
+                ids=ids[i:i + step]
+            )
         print(f"Index complete. Added {len(ids)} vectors.")
+        # Cached answers may quote the old inventory
+        answer_cache.invalidate(business_id)
+
+    def _build_document(self, record):
+        # Create a rich text representation for embedding.
+        # Name and category first (good for some models), then remaining fields.
+        doc_parts = [f"name: {record.name}"]
+        if record.category:
+            doc_parts.append(f"category: {record.category}")
+        if record.price is not None:
+            doc_parts.append(f"price: {record.price:g}")
+        for k, v in record.extra:
+            doc_parts.append(f"{k}: {v}")
+
+        return ". ".join(doc_parts)
+
+    @property
+    def max_batch_size(self):
+        # Chroma caps the number of records per add/upsert call
+        if hasattr(self.client, "get_max_batch_size"):
+            return self.client.get_max_batch_size()
+        return getattr(self.client, "max_batch_size", None) or 5000
+
+    def upsert_chunk(self, business_id, records, ids, ingest_id):
+        """
+        Embeds and upserts one chunk of records under caller-provided stable ids,
+        so re-running a chunk (e.g. when resuming an ingestion) overwrites it.
+        """
+        if not records:
+            return
+        documents = [self._build_document(record) for record in records]
+        metadatas = [dict(record.to_metadata(business_id), ingest_id=ingest_id) for record in records]
+        embeddings = self.embedder.embed(documents, priority=PRIORITY_BULK)
+        step = self.max_batch_size
+        for i in range(0, len(ids), step):
+            self.collection.upsert(
+                ids=ids[i:i + step],
+                documents=documents[i:i + step],
+                embeddings=embeddings[i:i + step],
+                metadatas=metadatas[i:i + step]
+            )
 
-    def search(self, query, business_id, limit=5):
+    def delete_stale(self, business_id, ingest_id, page_size=1000):
+        """
+        Removes this business's vectors that were not written by `ingest_id`,
+        paging through ids so memory stays bounded for large catalogs.
         """
-        Semantic search for items belonging to business_id.
+        removed = 0
+        offset = 0
+        while True:
+            page = self.collection.get(
+                where={"business_id": business_id},
+                include=["metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            stale = [
+                id_ for id_, meta in zip(page["ids"], page["metadatas"])
+                if not meta or meta.get("ingest_id") != ingest_id
+            ]
+            if stale:
+                self.collection.delete(ids=stale)
+                removed += len(stale)
+            # Deleted ids drop out of the result set; only kept ones shift the offset
+            offset += len(page["ids"]) - len(stale)
+        print(f"Removed {removed} stale vectors for business: {business_id}")
+        return removed
+
+    def search(self, query, business_id, limit=5, min_price=None, max_price=None, category=None, in_stock_only=False):
+        """
+        Semantic search for items belonging to business_id. Price, category
+        and stock filters are pushed down into the Chroma `where` clause.
         """
         print(f"DEBUG: Doing vector search for '{query}' in business '{business_id}'")
+        conditions = [{"business_id": business_id}]
+        if min_price is not None:
+            conditions.append({"price": {"$gte": float(min_price)}})
+        if max_price is not None:
+            conditions.append({"price": {"$lte": float(max_price)}})
+        if category:
+            conditions.append({"category": category.lower()})
+        if in_stock_only:
+            conditions.append({"in_stock": True})
+        where = conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+        query_embedding = self.embedder.embed_query(query)
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=[query_embedding],
             n_results=limit,
-            where={"business_id": business_id}
+            where=where
         )
         print(f"DEBUG: Raw Vector Results: {len(results['ids'][0])} matches.")
-        
-        # Parse results back to list of item dicts
+
+        # Rebuild items straight from the typed metadata
         items = []
         if results['metadatas']:
             for meta in results['metadatas'][0]:
-                if meta and 'json_data' in meta:
+                if not meta:
+                    continue
+                if 'json_data' in meta:
+                    # Legacy entry indexed before the typed metadata; re-index to upgrade
                     items.append(json.loads(meta['json_data']))
-        
+                else:
+                    items.append(InventoryRecord.from_metadata(meta).to_dict())
+
         return items